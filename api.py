@@ -0,0 +1,192 @@
+import argparse, gzip, hashlib, json, os, re, sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pyarrow as pa
+
+from app.alertas import cargar_alertas, ruta_alertas
+from app.frame_cache import cargar_publicada
+from app.store import cargar_version
+from app.version_cache import VersionCache
+
+# Tamaño máximo (en bytes) de las respuestas ya serializadas que se guardan en memoria
+API_CACHE_BYTES = int(os.getenv("API_CACHE_BYTES", 64 * 1024 * 1024))
+
+CONTENT_TYPE_JSON = "application/json; charset=utf-8"
+CONTENT_TYPE_ARROW = "application/vnd.apache.arrow.stream"
+
+# /municipios/<código INE>/<producto>
+RUTA_MUNICIPIO = re.compile(r"^/municipios/(\d{5})/(semanal|horaria|diaria|resumen)/?$")
+
+# Filas del DataFrame semanal de cada producto (None: todas)
+FILTROS = {
+    "semanal": None,
+    "horaria": lambda weather_df: weather_df["resolution"] == "hourly",
+    "diaria": lambda weather_df: weather_df["resolution"] != "hourly",
+}
+
+# Respuestas serializadas por (versión de la predicción, producto, formato, compresión)
+respuestas = VersionCache(API_CACHE_BYTES)
+
+
+def calcular_etag(version, *variante):
+    """ETag de una respuesta: solo cambia cuando cambia el `elaborado` de AEMET de los datos servidos."""
+    huella = hashlib.blake2b(json.dumps([list(version), *variante]).encode("utf-8"), digest_size=12)
+    return f'"{huella.hexdigest()}"'
+
+
+def serializar(frame_df, formato, metadatos):
+    """DataFrame como JSON ({...metadatos, "datos": [filas]}) o como stream de Arrow (metadatos en el esquema)."""
+    if formato == "arrow":
+        tabla = pa.Table.from_pandas(frame_df, preserve_index=False)
+        tabla = tabla.replace_schema_metadata({**(tabla.schema.metadata or {}),
+                                               b"plouterreta": json.dumps(metadatos).encode("utf-8")})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, tabla.schema) as writer:
+            writer.write_table(tabla)
+        return sink.getvalue().to_pybytes()
+    datos = frame_df.to_json(orient="records", date_format="iso", force_ascii=False)
+    return (json.dumps(metadatos, ensure_ascii=False)[:-1] + f', "datos": {datos}}}').encode("utf-8")
+
+
+def respuesta_municipio(codigo_municipio, producto, formato, comprimir):
+    """
+    Devuelve (etag, cuerpo) de un producto de un municipio publicado, o None si no está publicado.
+    `cuerpo` es una función: con un 304 no hace falta cargar ni serializar nada.
+    """
+    version = cargar_version(codigo_municipio, "semanal")
+    if version is None:
+        return None
+
+    def construir():
+        weather_df, resumen_df, _ = cargar_publicada(codigo_municipio)
+        if weather_df is None:
+            raise LookupError(codigo_municipio)
+        if producto == "resumen":
+            frame_df = resumen_df
+        else:
+            filtro = FILTROS[producto]
+            frame_df = weather_df if filtro is None else weather_df[filtro(weather_df)]
+        metadatos = {"municipio": codigo_municipio, "producto": producto,
+                     "elaborado": {"horaria": version[1], "diaria": version[2]}}
+        cuerpo = serializar(frame_df, formato, metadatos)
+        return gzip.compress(cuerpo) if comprimir else cuerpo
+
+    variante = (producto, formato, comprimir)
+    return calcular_etag(version, *variante), lambda: respuestas.get(version, variante, construir)
+
+
+def respuesta_alertas(codigo_municipio, comprimir):
+    """Devuelve (etag, cuerpo) con las alertas en vigor publicadas (de un municipio o de todos)."""
+    try:
+        version = ("alertas", os.stat(ruta_alertas()).st_mtime_ns)
+    except FileNotFoundError:
+        version = ("alertas", None)
+
+    def construir():
+        alertas = [alerta for alerta in cargar_alertas()
+                   if codigo_municipio is None or alerta["municipio"] == codigo_municipio]
+        cuerpo = json.dumps({"alertas": alertas}, ensure_ascii=False).encode("utf-8")
+        return gzip.compress(cuerpo) if comprimir else cuerpo
+
+    variante = (codigo_municipio, comprimir)
+    return calcular_etag(version, *variante), lambda: respuestas.get(version, variante, construir)
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    """
+    API de solo lectura con las predicciones ya procesadas y publicadas por refresher.py.
+
+    Nunca llama a AEMET: todo sale del fichero Arrow publicado y de las cachés en memoria. Cada
+    respuesta lleva un ETag derivado del `elaborado` de AEMET, así que los clientes que repiten la
+    petición con If-None-Match reciben un 304 sin cuerpo mientras no haya una predicción nueva.
+    """
+
+    protocol_version = "HTTP/1.1"  # Conexiones persistentes
+
+    def log_message(self, format, *args):
+        pass
+
+    def _responder(self, estado, cuerpo=b"", content_type=CONTENT_TYPE_JSON, etag=None, comprimido=False):
+        self.send_response(estado)
+        if etag is not None:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")  # Revalidar siempre (con If-None-Match)
+        if estado != 304:
+            if comprimido:
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(cuerpo)))
+        self.send_header("Vary", "Accept, Accept-Encoding")
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _responder_json(self, estado, cuerpo):
+        self._responder(estado, json.dumps(cuerpo, ensure_ascii=False).encode("utf-8"))
+
+    def _no_modificado(self, etag):
+        etags = self.headers.get("If-None-Match")
+        return etags is not None and (etags.strip() == "*" or etag in [e.strip() for e in etags.split(",")])
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parametros = parse_qs(url.query)
+        comprimir = "gzip" in self.headers.get("Accept-Encoding", "")
+        municipio = RUTA_MUNICIPIO.match(url.path)
+
+        if municipio:
+            codigo, producto = municipio.groups()
+            formato = parametros.get("formato", [None])[0]
+            if formato is None:
+                formato = "arrow" if CONTENT_TYPE_ARROW in self.headers.get("Accept", "") else "json"
+            if formato not in ("json", "arrow"):
+                self._responder_json(400, {"error": f"Formato no soportado: {formato}"})
+                return
+            comprimir = comprimir and formato == "json"  # El stream de Arrow ya es binario compacto
+            respuesta = respuesta_municipio(codigo, producto, formato, comprimir)
+            if respuesta is None:
+                self._responder_json(404, {"error": f"Municipio no publicado: {codigo}"})
+                return
+            content_type = CONTENT_TYPE_ARROW if formato == "arrow" else CONTENT_TYPE_JSON
+        elif url.path.rstrip("/") == "/alertas":
+            respuesta = respuesta_alertas(parametros.get("municipio", [None])[0], comprimir)
+            content_type = CONTENT_TYPE_JSON
+        else:
+            self._responder_json(404, {"error": "Recurso no encontrado"})
+            return
+
+        etag, cuerpo = respuesta
+        if self._no_modificado(etag):
+            self._responder(304, etag=etag)
+            return
+        try:
+            self._responder(200, cuerpo(), content_type, etag, comprimir)
+        except LookupError:
+            self._responder_json(404, {"error": "Predicción no disponible"})
+
+
+class ApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, direccion):
+        super().__init__(direccion, ApiHandler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API HTTP con las predicciones procesadas por refresher.py.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8600)
+    args = parser.parse_args()
+
+    servidor = ApiServer((args.host, args.puerto))
+    print(f"API de PlouTerreta en http://{args.host}:{args.puerto}", file=sys.stderr)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
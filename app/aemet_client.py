@@ -0,0 +1,237 @@
+import os, json, random, re, time, threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv  # Importa la función para cargar el .env
+
+try:
+    import orjson  # Opcional: decodificador JSON más rápido
+except ImportError:
+    orjson = None
+
+load_dotenv()  # Carga las variables de entorno desde el archivo .env
+AEMET_API_KEY = os.getenv("AEMET_API_KEY")
+
+# URL base de la API (se puede apuntar a otro servidor con la variable AEMET_BASE_URL)
+AEMET_BASE_URL = os.getenv("AEMET_BASE_URL", "https://opendata.aemet.es/opendata/api")
+
+# Productos de predicción por municipio disponibles
+PRODUCTOS = ("horaria", "diaria")
+
+# Codificación con la que AEMET sirve los datos de las predicciones
+CODIFICACION_AEMET = "iso-8859-15"
+# Únicos bytes en los que ISO-8859-15 se diferencia de latin-1 (€, Š, š, Ž, ž, Œ, œ, Ÿ)
+_BYTES_ISO_8859_15 = re.compile(rb"[\xa4\xa6\xa8\xb4\xb8\xbc-\xbe]")
+
+# Códigos HTTP tras los que merece la pena reintentar
+ESTADOS_REINTENTABLES = {429, 500, 502, 503, 504}
+
+# AEMET limita las peticiones por minuto: tras un 429 sin Retry-After se espera al minuto siguiente
+VENTANA_LIMITE = 60
+
+
+def decode_prediccion(contenido, codificacion=CODIFICACION_AEMET, solo_dia=False):
+    """
+    Convierte los bytes de una predicción de AEMET en objetos de Python sin pasar por la
+    detección de codificación de `requests`. Con `solo_dia=True` devuelve únicamente la
+    lista `prediccion.dia`, que es lo que necesitan los procesadores.
+    """
+    if contenido.isascii():
+        texto = contenido  # Los bytes ASCII se pueden decodificar directamente
+    elif codificacion.lower().replace("_", "-") in ("iso-8859-15", "latin-9"):
+        # El códec latin-1 está implementado en C y es mucho más rápido; solo se usa
+        # ISO-8859-15 cuando aparece alguno de los bytes en los que difieren
+        texto = contenido.decode(codificacion if _BYTES_ISO_8859_15.search(contenido) else "latin-1")
+    else:
+        texto = contenido.decode(codificacion)
+
+    data = orjson.loads(texto) if orjson is not None else json.loads(texto)
+    if solo_dia:
+        return data[0]["prediccion"]["dia"]
+    return data
+
+
+class AemetError(Exception):
+    """Error al obtener datos de AEMET OpenData."""
+
+    def __init__(self, mensaje, estado=None):
+        super().__init__(mensaje)
+        self.estado = estado
+
+
+class RateLimiter:
+    """
+    Limitador de peticiones por segundo (cubeta de fichas) compartido entre hilos. Tras un aviso de
+    límite excedido se puede pausar para todos los hilos a la vez.
+    """
+
+    def __init__(self, peticiones_por_segundo, rafaga=None):
+        self.ritmo = float(peticiones_por_segundo)
+        self.capacidad = float(rafaga or max(1.0, peticiones_por_segundo))
+        self._fichas = self.capacidad
+        self._ultimo = time.monotonic()
+        self._pausa_hasta = 0.0
+        self._lock = threading.Lock()
+
+    def pausar(self, segundos):
+        """Ninguna petición sale hasta dentro de `segundos`."""
+        with self._lock:
+            self._pausa_hasta = max(self._pausa_hasta, time.monotonic() + segundos)
+            self._fichas = min(self._fichas, 1.0)  # Sin ráfaga al terminar la pausa
+
+    def acquire(self):
+        """Bloquea hasta que haya una ficha disponible."""
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                if ahora < self._pausa_hasta:
+                    espera = self._pausa_hasta - ahora
+                else:
+                    self._fichas = min(self.capacidad, self._fichas + (ahora - max(self._ultimo, self._pausa_hasta)) * self.ritmo)
+                    self._ultimo = ahora
+                    if self._fichas >= 1:
+                        self._fichas -= 1
+                        return
+                    espera = (1 - self._fichas) / self.ritmo
+            time.sleep(espera)
+
+
+class AemetClient:
+    """
+    Cliente de AEMET OpenData con un pool de conexiones persistentes compartido.
+
+    Resuelve el flujo de dos pasos de la API (petición de metadatos y descarga del
+    enlace `datos`) con timeouts explícitos, compresión gzip y reintentos con espera
+    exponencial que respetan el límite de peticiones por minuto de AEMET.
+    """
+
+    def __init__(self, api_key=None, base_url=AEMET_BASE_URL, timeout=(3.05, 20),
+                 max_reintentos=4, espera_base=1.0, espera_maxima=30.0, pool_size=20, rate_limiter=None):
+        self.api_key = api_key or AEMET_API_KEY
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout  # (conexión, lectura) en segundos
+        self.max_reintentos = max_reintentos
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self.rate_limiter = rate_limiter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive",
+            "cache-control": "no-cache",
+        })
+
+    def _espera(self, intento, response=None):
+        """Calcula los segundos de espera antes del siguiente intento."""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), self.espera_maxima)
+        # Espera exponencial con algo de ruido para no sincronizar los reintentos de varios hilos
+        espera = self.espera_base * (2 ** intento)
+        return min(espera, self.espera_maxima) * random.uniform(0.8, 1.2)
+
+    def _espera_limite(self, response):
+        """
+        Segundos de espera tras superar el límite de peticiones: lo que indique Retry-After o, si no,
+        hasta el minuto siguiente ("Espere al siguiente minuto"), que es cuando AEMET renueva el cupo.
+        """
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return VENTANA_LIMITE - time.time() % VENTANA_LIMITE + random.uniform(0.5, 2.0)
+
+    def _limite_excedido(self, response):
+        """Detecta las respuestas de AEMET que indican que se ha superado el límite de peticiones."""
+        if response.status_code == 429:
+            return True
+        if "json" not in response.headers.get("Content-Type", ""):
+            return False
+        try:
+            cuerpo = response.json()
+        except ValueError:
+            return False
+        if not isinstance(cuerpo, dict):
+            return False
+        return cuerpo.get("estado") == 429 or "peticiones" in str(cuerpo.get("descripcion", "")).lower()
+
+    def _get(self, url, params=None):
+        """Realiza una petición GET con reintentos y devuelve la respuesta correcta."""
+        ultimo_error = None
+        for intento in range(self.max_reintentos + 1):
+            response = None
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                ultimo_error = AemetError(f"Error de conexión con AEMET: {e}")
+            else:
+                if self._limite_excedido(response):
+                    ultimo_error = AemetError("Límite de peticiones de AEMET excedido", 429)
+                    if intento < self.max_reintentos:
+                        # Esperar a que se renueve el cupo; con limitador, todos los hilos esperan a la vez
+                        espera = self._espera_limite(response)
+                        if self.rate_limiter is not None:
+                            self.rate_limiter.pausar(espera)
+                        else:
+                            time.sleep(espera)
+                    continue
+                elif response.status_code in ESTADOS_REINTENTABLES:
+                    ultimo_error = AemetError(f"Error del servidor de AEMET: {response.status_code}", response.status_code)
+                elif response.status_code != 200:
+                    raise AemetError(f"Error en la solicitud a AEMET: {response.status_code}", response.status_code)
+                else:
+                    return response
+
+            if intento < self.max_reintentos:
+                time.sleep(self._espera(intento, response))
+        raise ultimo_error
+
+    def get_metadatos(self, municipio, producto="horaria"):
+        """Realiza la primera petición y devuelve los metadatos con el enlace `datos`."""
+        if producto not in PRODUCTOS:
+            raise ValueError(f"Producto desconocido: {producto}")
+        url = f"{self.base_url}/prediccion/especifica/municipio/{producto}/{municipio}"
+        metadatos = self._get(url, params={"api_key": self.api_key}).json()
+
+        if metadatos.get("estado") != 200 or "datos" not in metadatos:
+            raise AemetError(f"Respuesta inesperada de AEMET: {metadatos.get('descripcion')}", metadatos.get("estado"))
+        return metadatos
+
+    def get_datos(self, municipio, producto="horaria"):
+        """Descarga la predicción tal y como la sirve AEMET (respuesta completa de la segunda petición)."""
+        metadatos = self.get_metadatos(municipio, producto)
+
+        # Realiza la segunda solicitud para obtener los datos meteorológicos
+        return self._get(metadatos["datos"])
+
+    def get_prediccion(self, municipio, producto="horaria", solo_dia=False):
+        """Devuelve la predicción del municipio para el producto pedido (horaria o diaria)."""
+        weather_response = self.get_datos(municipio, producto)
+        # La codificación se toma de la cabecera Content-Type, sin detección automática
+        codificacion = weather_response.encoding or CODIFICACION_AEMET
+        try:
+            return decode_prediccion(weather_response.content, codificacion, solo_dia)
+        except (ValueError, KeyError, IndexError) as e:
+            raise AemetError(f"Predicción de AEMET ilegible: {e}")
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Devuelve el cliente de AEMET compartido por todo el proceso."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = AemetClient()
+        return _client
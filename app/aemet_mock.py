@@ -0,0 +1,195 @@
+import argparse, gzip, json, os, random, re, sys, threading, time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from .aemet_client import PRODUCTOS, AemetClient, AemetError
+
+# Predicciones grabadas de AEMET: <FIXTURES_DIR>/<producto>/<codigo>.json (bytes tal cual, en ISO-8859-15)
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ejemplosOpenDataAEMET")
+
+RUTA_METADATOS = re.compile(r"^/opendata/api/prediccion/especifica/municipio/(horaria|diaria)/(\d{5})/?$")
+RUTA_DATOS = re.compile(r"^/opendata/sh/(horaria|diaria)/(\d{5})$")
+
+CONTENT_TYPE_JSON = "application/json;charset=UTF-8"
+CONTENT_TYPE_DATOS = "text/plain;charset=ISO-8859-15"
+
+
+def ruta_fixture(codigo_municipio, producto, fixtures_dir=FIXTURES_DIR):
+    return os.path.join(fixtures_dir, producto, f"{codigo_municipio}.json")
+
+
+def grabar(codigos, productos=PRODUCTOS, fixtures_dir=FIXTURES_DIR, client=None):
+    """Descarga predicciones reales de AEMET y guarda los bytes recibidos como fixtures."""
+    client = client or AemetClient()
+    for codigo in codigos:
+        for producto in productos:
+            try:
+                contenido = client.get_datos(codigo, producto).content
+            except AemetError as e:
+                print(f"Error al grabar {producto}/{codigo}: {e}", file=sys.stderr)
+                continue
+            ruta = ruta_fixture(codigo, producto, fixtures_dir)
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            with open(ruta, "wb") as f:
+                f.write(contenido)
+            print(f"Grabado {ruta} ({len(contenido)} bytes)", file=sys.stderr)
+
+
+class LimitePeticiones:
+    """Cuenta las peticiones del último minuto, como el límite por usuario de AEMET."""
+
+    def __init__(self, por_minuto):
+        self.por_minuto = por_minuto
+        self._peticiones = deque()
+        self._lock = threading.Lock()
+
+    def permitir(self):
+        if not self.por_minuto:
+            return True
+        with self._lock:
+            ahora = time.monotonic()
+            while self._peticiones and ahora - self._peticiones[0] > 60:
+                self._peticiones.popleft()
+            if len(self._peticiones) >= self.por_minuto:
+                return False
+            self._peticiones.append(ahora)
+            return True
+
+
+class AemetMockServer(ThreadingHTTPServer):
+    """
+    Servidor local que imita el flujo de dos pasos de la predicción por municipio de AEMET
+    OpenData y reproduce las predicciones grabadas en `fixtures_dir`.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, direccion, fixtures_dir=FIXTURES_DIR, latencia=0.0, jitter=0.0,
+                 limite_por_minuto=0, reutilizar=False):
+        super().__init__(direccion, AemetMockHandler)
+        self.fixtures_dir = fixtures_dir
+        self.latencia = latencia  # segundos añadidos a cada respuesta
+        self.jitter = jitter
+        self.limite = LimitePeticiones(limite_por_minuto)
+        self.reutilizar = reutilizar  # servir otra predicción grabada si el municipio no tiene la suya
+        self._fixtures = {}
+
+    @property
+    def base_url(self):
+        host, puerto = self.server_address[:2]
+        return f"http://{host}:{puerto}/opendata/api"
+
+    def fixture(self, codigo_municipio, producto):
+        """Devuelve los bytes grabados de la predicción, o None si no hay ninguna."""
+        clave = (codigo_municipio, producto)
+        if clave not in self._fixtures:
+            ruta = ruta_fixture(codigo_municipio, producto, self.fixtures_dir)
+            if not os.path.exists(ruta) and self.reutilizar:
+                carpeta = os.path.join(self.fixtures_dir, producto)
+                grabadas = sorted(os.listdir(carpeta)) if os.path.isdir(carpeta) else []
+                ruta = os.path.join(carpeta, grabadas[0]) if grabadas else ruta
+            contenido = None
+            if os.path.exists(ruta):
+                with open(ruta, "rb") as f:
+                    contenido = f.read()
+            self._fixtures[clave] = contenido
+        return self._fixtures[clave]
+
+
+class AemetMockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Conexiones persistentes, como la API real
+
+    def log_message(self, format, *args):
+        pass
+
+    def _responder(self, estado, cuerpo, content_type):
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            cuerpo = gzip.compress(cuerpo)
+            self.send_response(estado)
+            self.send_header("Content-Encoding", "gzip")
+        else:
+            self.send_response(estado)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _responder_json(self, estado, cuerpo):
+        self._responder(estado, json.dumps(cuerpo, ensure_ascii=False).encode("utf-8"), CONTENT_TYPE_JSON)
+
+    def do_GET(self):
+        servidor = self.server
+        if servidor.latencia or servidor.jitter:
+            time.sleep(max(0.0, servidor.latencia + random.uniform(-servidor.jitter, servidor.jitter)))
+
+        if not servidor.limite.permitir():
+            self._responder_json(429, {
+                "descripcion": "Límite de peticiones o caudal por minuto excedido para este usuario. Espere al siguiente minuto.",
+                "estado": 429,
+            })
+            return
+
+        ruta = urlparse(self.path).path
+        metadatos = RUTA_METADATOS.match(ruta)
+        datos = RUTA_DATOS.match(ruta)
+        if metadatos:
+            producto, codigo = metadatos.groups()
+            if servidor.fixture(codigo, producto) is None:
+                self._responder_json(404, {"descripcion": "No hay datos que satisfagan esos criterios", "estado": 404})
+                return
+            host = self.headers.get("Host", "%s:%s" % servidor.server_address[:2])
+            self._responder_json(200, {
+                "descripcion": "exito",
+                "estado": 200,
+                "datos": f"http://{host}/opendata/sh/{producto}/{codigo}",
+                "metadatos": f"http://{host}/opendata/sh/metadatos",
+            })
+        elif datos:
+            producto, codigo = datos.groups()
+            contenido = servidor.fixture(codigo, producto)
+            if contenido is None:
+                self._responder_json(404, {"descripcion": "No hay datos que satisfagan esos criterios", "estado": 404})
+                return
+            self._responder(200, contenido, CONTENT_TYPE_DATOS)
+        else:
+            self._responder_json(404, {"descripcion": "Recurso no encontrado", "estado": 404})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local que imita AEMET OpenData con predicciones grabadas.")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    servir = subparsers.add_parser("servir", help="arranca el servidor local")
+    servir.add_argument("--host", default="127.0.0.1")
+    servir.add_argument("--puerto", type=int, default=8765)
+    servir.add_argument("--fixtures", default=FIXTURES_DIR, help="carpeta con las predicciones grabadas")
+    servir.add_argument("--latencia", type=float, default=0.0, help="milisegundos añadidos a cada respuesta")
+    servir.add_argument("--jitter", type=float, default=0.0, help="variación aleatoria de la latencia (ms)")
+    servir.add_argument("--limite-por-minuto", type=int, default=0, help="peticiones por minuto antes de responder 429")
+    servir.add_argument("--reutilizar", action="store_true",
+                        help="responde a cualquier municipio con una predicción grabada de otro")
+
+    grabacion = subparsers.add_parser("grabar", help="graba predicciones reales de AEMET como fixtures")
+    grabacion.add_argument("codigos", nargs="+", help="códigos INE de los municipios")
+    grabacion.add_argument("--productos", nargs="+", choices=PRODUCTOS, default=list(PRODUCTOS))
+    grabacion.add_argument("--fixtures", default=FIXTURES_DIR)
+
+    args = parser.parse_args()
+    if args.comando == "grabar":
+        grabar(args.codigos, args.productos, args.fixtures)
+        return
+
+    servidor = AemetMockServer((args.host, args.puerto), args.fixtures, args.latencia / 1000, args.jitter / 1000,
+                               args.limite_por_minuto, args.reutilizar)
+    print(f"AEMET simulado en {servidor.base_url} (usa AEMET_BASE_URL={servidor.base_url})", file=sys.stderr)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import json, operator, os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .pipeline import DURACIONES
+from .store import DATA_DIR, escribir_atomico
+
+# Reglas de alerta: se cumplen en las filas en las que `columna` `operador` `umbral`, y se avisa
+# cuando el periodo que las cumple empieza dentro de las próximas `horas`
+REGLAS = [
+    {"id": "tormenta", "columna": "storm_probability", "operador": ">=", "umbral": 60, "horas": 6,
+     "texto": "⛈️ Probabilidad de tormenta del {valor:.0f} %"},
+    {"id": "lluvia", "columna": "precipitation_value", "operador": ">=", "umbral": 80, "horas": 12,
+     "texto": "🌧️ Probabilidad de lluvia del {valor:.0f} %"},
+    {"id": "viento", "columna": "wind_gust", "operador": ">=", "umbral": 60, "horas": 24,
+     "texto": "💨 Rachas de viento de {valor:.0f} km/h"},
+    {"id": "calor", "columna": "temperature_max", "operador": ">=", "umbral": 35, "horas": 48,
+     "texto": "🥵 Máxima de {valor:.0f} °C"},
+    {"id": "helada", "columna": "temperature_min", "operador": "<=", "umbral": 0, "horas": 48,
+     "texto": "🥶 Mínima de {valor:.0f} °C"},
+]
+
+# Operador de cada regla y agregación del valor más extremo del episodio
+OPERADORES = {">=": (operator.ge, "max"), ">": (operator.gt, "max"), "<=": (operator.le, "min"), "<": (operator.lt, "min")}
+
+# Columnas de los episodios de alerta
+COLUMNAS_EPISODIOS = ["regla", "municipio", "fecha", "inicio", "fin", "valor"]
+
+
+def ruta_alertas(data_dir=None):
+    """Devuelve la ruta del JSON con las alertas activas publicadas por refresher.py."""
+    return os.path.join(data_dir or DATA_DIR, "processed", "alertas.json")
+
+
+def episodios(weather_df, reglas=REGLAS):
+    """
+    Evalúa las reglas sobre un DataFrame semanal (de un municipio, o de varios con `municipio` en el
+    índice o como columna) y devuelve un episodio por (regla, municipio, día) con el inicio del primer
+    periodo que cumple la regla, el final del último y el valor más extremo.
+
+    Las filas de cada (municipio, día) son contiguas (el DataFrame está ordenado por municipio y
+    fecha_hora), así que los episodios salen de reducir por tramos los arrays, sin agrupar en pandas.
+    """
+    if "municipio" in weather_df.index.names:
+        weather_df = weather_df.reset_index()
+    if "municipio" in weather_df:
+        codigos, municipios = pd.factorize(weather_df["municipio"])
+        municipios = np.asarray(municipios, dtype=object)
+    else:
+        codigos, municipios = np.zeros(len(weather_df), dtype=np.int64), np.array([None], dtype=object)
+    dias = weather_df["fecha"].to_numpy(dtype="datetime64[D]")
+    inicio = weather_df["fecha_hora"].to_numpy(dtype="datetime64[us]")
+    resolucion = weather_df["resolution"].cat
+    duraciones = np.array([DURACIONES[r] for r in resolucion.categories], dtype="timedelta64[us]")
+    fin = inicio + duraciones[resolucion.codes.to_numpy()]
+
+    partes = {columna: [] for columna in COLUMNAS_EPISODIOS}
+    for regla in reglas:
+        comparar, agregacion = OPERADORES[regla["operador"]]
+        valores = weather_df[regla["columna"]].to_numpy(dtype=np.float64, na_value=np.nan)
+        filas = np.flatnonzero(comparar(valores, regla["umbral"]))  # NaN nunca cumple la regla
+        if len(filas) == 0:
+            continue
+        # Primera fila de cada tramo (municipio, día) entre las filas que cumplen la regla
+        cambia = (codigos[filas][1:] != codigos[filas][:-1]) | (dias[filas][1:] != dias[filas][:-1])
+        tramos = np.flatnonzero(np.concatenate(([True], cambia)))
+        reducir = np.maximum if agregacion == "max" else np.minimum
+        partes["regla"].append(np.full(len(tramos), regla["id"], dtype=object))
+        partes["municipio"].append(municipios[codigos[filas][tramos]])
+        partes["fecha"].append(dias[filas][tramos])
+        partes["inicio"].append(np.minimum.reduceat(inicio[filas], tramos))
+        partes["fin"].append(np.maximum.reduceat(fin[filas], tramos))
+        partes["valor"].append(reducir.reduceat(valores[filas], tramos))
+
+    if not partes["regla"]:
+        return pd.DataFrame(columns=COLUMNAS_EPISODIOS)
+    episodios_df = pd.DataFrame({columna: np.concatenate(arrays) for columna, arrays in partes.items()})
+    episodios_df["fecha"] = episodios_df["fecha"].astype("datetime64[us]")
+    return episodios_df
+
+
+def en_horizonte(episodios_df, ahora=None, reglas=REGLAS):
+    """Episodios que no han terminado y que empiezan dentro del horizonte de su regla."""
+    ahora = pd.Timestamp(ahora if ahora is not None else datetime.now())
+    horas = episodios_df["regla"].map({regla["id"]: regla["horas"] for regla in reglas}).astype(float)
+    limite = ahora + pd.to_timedelta(horas, unit="h")
+    return episodios_df[(episodios_df["inicio"] <= limite) & (episodios_df["fin"] > ahora)]
+
+
+def texto_alerta(episodio, reglas=REGLAS):
+    """Texto de aviso de un episodio (con la hora de inicio)."""
+    regla = next(regla for regla in reglas if regla["id"] == episodio["regla"])
+    return f"{regla['texto'].format(valor=episodio['valor'])} desde el {episodio['inicio']:%d/%m %H:%M}"
+
+
+def alertas_activas(weather_df, ahora=None):
+    """Alertas en vigor de un DataFrame semanal (episodios dentro del horizonte de su regla)."""
+    return en_horizonte(episodios(weather_df), ahora)
+
+
+class MotorAlertas:
+    """
+    Episodios de alerta de todos los municipios publicados.
+
+    En cada refresco solo se vuelven a evaluar los municipios con una predicción nueva; los demás
+    conservan sus episodios. Cada episodio, identificado por (regla, municipio, día), se emite una sola
+    vez aunque siga en vigor en refrescos posteriores.
+    """
+
+    def __init__(self, emitidas=()):
+        self.episodios = pd.DataFrame(columns=COLUMNAS_EPISODIOS)
+        self._emitidas = set(emitidas)
+
+    def actualizar(self, weather_df):
+        """Sustituye los episodios de los municipios de `weather_df` por los de su nueva predicción."""
+        if "municipio" in weather_df.index.names:
+            municipios = weather_df.index.unique("municipio").astype(str)
+        else:
+            municipios = weather_df["municipio"].unique().astype(str)
+        nuevos = episodios(weather_df)
+        anteriores = self.episodios[~self.episodios["municipio"].isin(municipios)]
+        self.episodios = pd.concat([df for df in (anteriores, nuevos) if not df.empty] or [nuevos], ignore_index=True)
+
+    def activas(self, ahora=None):
+        """Episodios de todos los municipios que están en vigor."""
+        return en_horizonte(self.episodios, ahora)
+
+    def nuevas(self, ahora=None):
+        """Episodios en vigor que no se habían emitido todavía (y los marca como emitidos)."""
+        activas = self.activas(ahora)
+        if activas.empty:
+            self._emitidas = set()
+            return activas
+        claves = list(zip(activas["regla"], activas["municipio"], activas["fecha"].dt.strftime("%Y-%m-%d")))
+        nuevas = [clave not in self._emitidas for clave in claves]
+        # Solo se recuerdan las claves de los episodios en vigor, para que el conjunto no crezca
+        self._emitidas = set(claves)
+        return activas[nuevas]
+
+
+def guardar_alertas(alertas_df, data_dir=None):
+    """Publica las alertas en vigor en un JSON (lista de episodios con su texto)."""
+    alertas = [
+        {"regla": episodio["regla"], "municipio": episodio["municipio"], "fecha": f"{episodio['fecha']:%Y-%m-%d}",
+         "inicio": episodio["inicio"].isoformat(), "fin": episodio["fin"].isoformat(),
+         "valor": float(episodio["valor"]), "texto": texto_alerta(episodio)}
+        for episodio in alertas_df.to_dict("records")
+    ]
+    escribir_atomico(ruta_alertas(data_dir), json.dumps(alertas, ensure_ascii=False, indent=1).encode("utf-8"))
+
+
+def cargar_alertas(data_dir=None):
+    """Carga las alertas publicadas (lista vacía si no hay)."""
+    ruta = ruta_alertas(data_dir)
+    if not os.path.exists(ruta):
+        return []
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
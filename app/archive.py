@@ -0,0 +1,225 @@
+import os, shutil, time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from .store import DATA_DIR
+
+# Dataset Parquet con todas las predicciones procesadas, particionado por día de emisión y provincia
+ARCHIVO_DIR = os.path.join(DATA_DIR, "archive")
+
+ESQUEMA_ARCHIVO = pa.schema([
+    ("municipio", pa.string()),
+    ("elaborado", pa.timestamp("s")),
+    ("fecha_hora", pa.timestamp("us")),
+    ("resolution", pa.string()),
+    ("periodo", pa.string()),
+    ("temperature_max", pa.int8()),
+    ("temperature_min", pa.int8()),
+    ("temperature_value", pa.int8()),
+    ("precipitation_value", pa.uint8()),
+    ("sky_value", pa.uint8()),
+    ("sky_description", pa.string()),
+    ("sky_severity", pa.uint8()),
+    ("wind_direction", pa.string()),
+    ("wind_speed", pa.uint8()),
+    ("wind_gust", pa.uint8()),
+    ("storm_probability", pa.uint8()),
+    # Columnas de partición (se guardan en la ruta: fecha_emision=AAAA-MM-DD/provincia=PP)
+    ("fecha_emision", pa.string()),
+    ("provincia", pa.string()),
+])
+
+PARTICIONADO = ds.partitioning(pa.schema([("fecha_emision", pa.string()), ("provincia", pa.string())]), flavor="hive")
+
+# Columnas guardadas dentro de cada fichero (sin las de partición); los ficheros escritos antes de
+# añadir una columna la leen como nula
+ESQUEMA_FICHERO = pa.schema([campo for campo in ESQUEMA_ARCHIVO if campo.name not in PARTICIONADO.schema.names])
+
+# Filas por grupo: los ficheros se ordenan por (municipio, fecha_hora) para que las
+# estadísticas de cada grupo permitan saltarse los que no contienen el municipio pedido
+FILAS_POR_GRUPO = 8192
+
+# Días de emisión (contando hoy) cuyas particiones aún pueden recibir ficheros: se particiona por el
+# `elaborado` de AEMET, así que una emisión de las 23:50 se archiva pasada la medianoche en la del día anterior
+DIAS_ABIERTOS = 2
+
+
+def _escribir_archivo(archivo_df, archivo_dir=None):
+    """Convierte a Arrow las filas a archivar (con `municipio` y `elaborado`) y las añade al dataset."""
+    if archivo_df.empty:
+        return 0
+    archivo_df["elaborado"] = pd.to_datetime(archivo_df["elaborado"], format="%Y-%m-%dT%H:%M:%S")
+    archivo_df["fecha_emision"] = archivo_df["elaborado"].dt.strftime("%Y-%m-%d")
+    archivo_df["provincia"] = archivo_df["municipio"].str[:2]
+    for columna in ESQUEMA_ARCHIVO.names:
+        if columna not in archivo_df:
+            archivo_df[columna] = None
+    # Las categorías se guardan como texto (Parquet ya las codifica como diccionario)
+    for columna in archivo_df.select_dtypes("category"):
+        archivo_df[columna] = archivo_df[columna].astype(object)
+    tabla = pa.Table.from_pandas(archivo_df[ESQUEMA_ARCHIVO.names], schema=ESQUEMA_ARCHIVO, preserve_index=False)
+    tabla = tabla.sort_by([("municipio", "ascending"), ("fecha_hora", "ascending")])
+    ds.write_dataset(
+        tabla, archivo_dir or ARCHIVO_DIR, format="parquet", partitioning=PARTICIONADO,
+        basename_template=f"part-{time.time_ns()}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        max_rows_per_group=FILAS_POR_GRUPO, min_rows_per_group=min(FILAS_POR_GRUPO, tabla.num_rows),
+        file_options=ds.ParquetFileFormat().make_write_options(compression="zstd"),
+    )
+    return tabla.num_rows
+
+
+def archivar_batch(batch_df, versiones, archivo_dir=None):
+    """
+    Añade al archivo el DataFrame semanal de varios municipios (índice (municipio, fecha_hora)).
+    `versiones` es {codigo: {"horaria": elaborado, "diaria": elaborado}}: cada fila toma el de su
+    producto y se omiten las de los productos con None (sin emisión nueva, ya archivadas antes).
+    Cada llamada escribe ficheros nuevos en sus particiones, sin reescribir los existentes.
+    """
+    archivo_df = batch_df.reset_index()
+    archivo_df["municipio"] = archivo_df["municipio"].astype(str)
+    horaria = (archivo_df["resolution"] == "hourly").to_numpy()
+    elaborado = np.where(horaria,
+                         archivo_df["municipio"].map({codigo: v["horaria"] for codigo, v in versiones.items()}),
+                         archivo_df["municipio"].map({codigo: v["diaria"] for codigo, v in versiones.items()}))
+    nuevas = pd.notna(elaborado)
+    return _escribir_archivo(archivo_df[nuevas].assign(elaborado=elaborado[nuevas]), archivo_dir)
+
+
+def _dataset(archivo_dir=None):
+    return ds.dataset(archivo_dir or ARCHIVO_DIR, format="parquet", partitioning=PARTICIONADO, schema=ESQUEMA_ARCHIVO)
+
+
+def _filtro(municipio=None, desde=None, hasta=None, emitido_desde=None, emitido_hasta=None):
+    """Construye el filtro del dataset; las condiciones sobre las particiones evitan abrir ficheros."""
+    condiciones = []
+    if municipio is not None:
+        condiciones += [ds.field("provincia") == municipio[:2], ds.field("municipio") == municipio]
+    if desde is not None:
+        condiciones.append(ds.field("fecha_hora") >= pd.Timestamp(desde).to_pydatetime())
+    if hasta is not None:
+        condiciones.append(ds.field("fecha_hora") <= pd.Timestamp(hasta).to_pydatetime())
+    if emitido_desde is not None:
+        emitido_desde = pd.Timestamp(emitido_desde)
+        condiciones += [ds.field("fecha_emision") >= emitido_desde.strftime("%Y-%m-%d"),
+                        ds.field("elaborado") >= emitido_desde.to_pydatetime()]
+    if emitido_hasta is not None:
+        emitido_hasta = pd.Timestamp(emitido_hasta)
+        condiciones += [ds.field("fecha_emision") <= emitido_hasta.strftime("%Y-%m-%d"),
+                        ds.field("elaborado") <= emitido_hasta.to_pydatetime()]
+
+    filtro = None
+    for condicion in condiciones:
+        filtro = condicion if filtro is None else filtro & condicion
+    return filtro
+
+
+def leer_archivo(municipio=None, desde=None, hasta=None, emitido_desde=None, emitido_hasta=None,
+                 columnas=None, archivo_dir=None):
+    """Lee del archivo las filas que cumplen los filtros (municipio, rango de fecha_hora y de emisión)."""
+    if not os.path.isdir(archivo_dir or ARCHIVO_DIR):
+        return pd.DataFrame(columns=columnas or ESQUEMA_ARCHIVO.names)
+    filtro = _filtro(municipio, desde, hasta, emitido_desde, emitido_hasta)
+    return _dataset(archivo_dir).to_table(columns=columnas, filter=filtro).to_pandas()
+
+
+def iterar_archivo(municipio=None, desde=None, hasta=None, emitido_desde=None, emitido_hasta=None,
+                   columnas=None, archivo_dir=None, filas_por_lote=65536):
+    """Recorre el archivo por lotes de DataFrames, con memoria acotada aunque tenga millones de filas."""
+    if not os.path.isdir(archivo_dir or ARCHIVO_DIR):
+        return
+    filtro = _filtro(municipio, desde, hasta, emitido_desde, emitido_hasta)
+    for lote in _dataset(archivo_dir).to_batches(columns=columnas, filter=filtro, batch_size=filas_por_lote):
+        if lote.num_rows:
+            yield lote.to_pandas()
+
+
+def prediccion_emitida(municipio, momento, archivo_dir=None, ventana=timedelta(days=2)):
+    """
+    Devuelve la predicción de un municipio tal y como estaba publicada en `momento`: para cada
+    producto, las filas de su última emisión anterior a esa fecha.
+    """
+    momento = pd.Timestamp(momento)
+    archivo_df = leer_archivo(municipio, emitido_desde=momento - ventana, emitido_hasta=momento, archivo_dir=archivo_dir)
+    if archivo_df.empty:
+        return archivo_df
+    horaria = archivo_df["resolution"] == "hourly"
+    ultima = archivo_df.groupby(horaria)["elaborado"].transform("max")
+    return archivo_df[archivo_df["elaborado"] == ultima].sort_values("fecha_hora", ignore_index=True)
+
+
+def _rutas_compactado(ruta_particion):
+    """Carpetas hermanas de una partición durante la compactación (ocultas: el dataset las ignora)."""
+    padre, nombre = os.path.split(os.path.normpath(ruta_particion))
+    return os.path.join(padre, f".compactando-{nombre}"), os.path.join(padre, f".compactado-{nombre}")
+
+
+def _recuperar_compactado(ruta_particion):
+    """Termina o deshace una compactación interrumpida de la partición."""
+    nueva, vieja = _rutas_compactado(ruta_particion)
+    if os.path.isdir(nueva):
+        if os.path.isdir(ruta_particion):
+            shutil.rmtree(nueva)  # Se cortó antes del cambio: la partición original sigue entera
+        else:
+            os.rename(nueva, ruta_particion)  # Se cortó entre los dos renombrados
+    if os.path.isdir(vieja):
+        shutil.rmtree(vieja)
+
+
+def compactar_particion(ruta_particion):
+    """
+    Une en un único fichero los ficheros pequeños de una partición ya cerrada (anterior a DIAS_ABIERTOS).
+
+    El fichero compactado se escribe en una carpeta hermana y luego se intercambian las carpetas, así
+    que los lectores nunca ven a la vez los ficheros originales y el compactado. Si el proceso se corta,
+    la siguiente compactación termina o deshace el cambio a medias.
+    """
+    _recuperar_compactado(ruta_particion)
+    if not os.path.isdir(ruta_particion):
+        return
+    ficheros = sorted(os.path.join(ruta_particion, f) for f in os.listdir(ruta_particion) if f.endswith(".parquet"))
+    if len(ficheros) < 2:
+        return
+    tabla = ds.dataset(ficheros, format="parquet", schema=ESQUEMA_FICHERO).to_table()
+    tabla = tabla.sort_by([("municipio", "ascending"), ("elaborado", "ascending"), ("fecha_hora", "ascending")])
+
+    nueva, vieja = _rutas_compactado(ruta_particion)
+    os.makedirs(nueva)
+    with open(os.path.join(nueva, f"part-{time.time_ns()}-compacto.parquet"), "wb") as f:
+        pq.write_table(tabla, f, row_group_size=FILAS_POR_GRUPO, compression="zstd")
+        f.flush()
+        os.fsync(f.fileno())
+    os.rename(ruta_particion, vieja)
+    os.rename(nueva, ruta_particion)
+    shutil.rmtree(vieja)
+
+
+def main():
+    import argparse
+    from datetime import date
+
+    parser = argparse.ArgumentParser(description="Mantenimiento del archivo de predicciones en Parquet.")
+    parser.add_argument("--compactar", action="store_true",
+                        help="une los ficheros de cada partición de días de emisión ya cerrados")
+    parser.add_argument("--archivo", default=ARCHIVO_DIR, help="carpeta del archivo")
+    args = parser.parse_args()
+
+    if args.compactar and os.path.isdir(args.archivo):
+        # Solo los días en los que el refresco ya no puede añadir ficheros (hoy y ayer siguen abiertos)
+        abierto = f"fecha_emision={date.today() - timedelta(days=DIAS_ABIERTOS - 1):%Y-%m-%d}"
+        for dia in sorted(os.listdir(args.archivo)):
+            if dia.startswith("fecha_emision=") and dia < abierto:
+                # También las particiones con una compactación interrumpida (solo en carpetas ocultas)
+                provincias = {provincia.split("-", 1)[-1] if provincia.startswith(".") else provincia
+                              for provincia in os.listdir(os.path.join(args.archivo, dia))}
+                for provincia in sorted(provincias):
+                    compactar_particion(os.path.join(args.archivo, dia, provincia))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import argparse, os, sys, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .aemet_client import AemetClient, AemetError, RateLimiter
+from .municipios import PROVINCIAS_CV, municipios_provincias
+from .store import guardar_prediccion
+
+# Valores por defecto de la descarga masiva. Cada municipio son dos peticiones por producto
+# (metadatos y `datos`): refrescar los 542 municipios con los dos productos son unas 2.170
+# peticiones, algo menos de dos minutos a 20 por segundo. Si la clave de AEMET tiene un cupo por
+# minuto menor, hay que bajar el límite: los avisos de cupo excedido se esperan hasta el minuto
+# siguiente, pero cada uno detiene todas las descargas.
+WORKERS = int(os.getenv("AEMET_WORKERS", 16))
+PETICIONES_POR_SEGUNDO = float(os.getenv("AEMET_PETICIONES_POR_SEGUNDO", 20))
+
+
+def prefetch_productos(codigos, productos=("horaria", "diaria"), workers=WORKERS,
+                       peticiones_por_segundo=PETICIONES_POR_SEGUNDO, client=None, guardar=guardar_prediccion,
+                       progreso=None):
+    """
+    Descarga en paralelo varios productos de varios municipios en un mismo pool y bajo un mismo
+    límite global de peticiones, sin esperar a terminar un producto para empezar el siguiente.
+
+    Cada predicción descargada se pasa a `guardar(codigo, data, producto)`. Si se indica,
+    `progreso(hechos, total, codigo, error)` se llama al terminar cada descarga.
+    Devuelve dos diccionarios por producto: {producto: {codigo: predicción}} y {producto: {codigo: error}}.
+    """
+    tareas = [(codigo, producto) for codigo in codigos for producto in productos]
+    if client is None:
+        client = AemetClient(pool_size=workers, rate_limiter=RateLimiter(peticiones_por_segundo))
+
+    def descargar(codigo, producto):
+        data = client.get_prediccion(codigo, producto)
+        if guardar is not None:
+            guardar(codigo, data, producto)
+        return data
+
+    resultados = {producto: {} for producto in productos}
+    fallos = {producto: {} for producto in productos}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futuros = {executor.submit(descargar, *tarea): tarea for tarea in tareas}
+        for hechos, futuro in enumerate(as_completed(futuros), start=1):
+            codigo, producto = futuros[futuro]
+            error = None
+            try:
+                resultados[producto][codigo] = futuro.result()
+            except (AemetError, ValueError, OSError) as e:
+                error = fallos[producto][codigo] = str(e)
+            if progreso is not None:
+                progreso(hechos, len(tareas), codigo if len(productos) == 1 else f"{codigo} {producto}", error)
+    return resultados, fallos
+
+
+def prefetch(codigos, producto="horaria", workers=WORKERS, peticiones_por_segundo=PETICIONES_POR_SEGUNDO,
+             client=None, guardar=guardar_prediccion, progreso=None):
+    """
+    Descarga en paralelo la predicción de varios municipios bajo un límite global de peticiones.
+    Devuelve un diccionario con las predicciones descargadas y otro con los fallos.
+    """
+    resultados, fallos = prefetch_productos(codigos, (producto,), workers, peticiones_por_segundo,
+                                            client, guardar, progreso)
+    return resultados[producto], fallos[producto]
+
+
+def mostrar_progreso(hechos, total, codigo, error):
+    """Muestra el progreso de la descarga en la terminal."""
+    estado = f"ERROR {codigo}: {error}" if error else codigo
+    print(f"\r[{hechos}/{total}] {estado:<60}", end="\n" if error else "", file=sys.stderr, flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Descarga las predicciones de todos los municipios de la Comunidad Valenciana.")
+    parser.add_argument("--provincias", nargs="+", default=list(PROVINCIAS_CV),
+                        help="códigos de provincia a descargar (por defecto 03 12 46)")
+    parser.add_argument("--producto", nargs="+", choices=["horaria", "diaria"], default=["horaria"],
+                        help="productos a descargar (a la vez, con el mismo límite de peticiones)")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="descargas simultáneas")
+    parser.add_argument("--peticiones-por-segundo", type=float, default=PETICIONES_POR_SEGUNDO,
+                        help="límite global de peticiones a AEMET")
+    args = parser.parse_args()
+
+    codigos = municipios_provincias(args.provincias)
+    inicio = time.perf_counter()
+    resultados, fallos = prefetch_productos(codigos, list(dict.fromkeys(args.producto)), args.workers, args.peticiones_por_segundo,
+                                            progreso=mostrar_progreso)
+    descargados = sum(len(resultados_producto) for resultados_producto in resultados.values())
+    errores = sorted((codigo, producto, error) for producto, fallos_producto in fallos.items()
+                     for codigo, error in fallos_producto.items())
+    print(f"\n{descargados} predicciones descargadas, {len(errores)} fallos en {time.perf_counter() - inicio:.1f} s",
+          file=sys.stderr)
+    for codigo, producto, error in errores:
+        print(f"{codigo}\t{codigos[codigo]}\t{producto}\t{error}")
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+import os, threading, time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .data_fetching import get_prediccion
+
+# Tiempo (en segundos) que una predicción se considera fresca antes de revalidarla
+FORECAST_CACHE_TTL = int(os.getenv("FORECAST_CACHE_TTL", 15 * 60))
+# Número máximo de predicciones (municipio, producto) en memoria
+FORECAST_CACHE_MAX = int(os.getenv("FORECAST_CACHE_MAX", 256))
+
+
+def get_elaborado(data):
+    """Devuelve la fecha de elaboración (`elaborado`) de una respuesta de AEMET, o None."""
+    if data and isinstance(data, list) and isinstance(data[0], dict):
+        return data[0].get("elaborado")
+    return None
+
+
+class ForecastCache:
+    """
+    Caché en memoria de predicciones por (municipio, producto) con expulsión LRU.
+
+    Cuando una entrada caduca se sirve igualmente el dato antiguo y se revalida en
+    segundo plano (stale-while-revalidate). La versión de cada entrada es el campo
+    `elaborado` de AEMET: si la nueva descarga trae el mismo `elaborado`, se conserva
+    el objeto ya cacheado y solo se renueva su caducidad. Las sesiones que piden a la vez
+    una predicción que no está en memoria comparten una única descarga.
+    """
+
+    def __init__(self, fetch=get_prediccion, ttl=FORECAST_CACHE_TTL, max_entradas=FORECAST_CACHE_MAX):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()  # (municipio, producto) -> {"data", "elaborado", "obtenido"}
+        self._refrescando = set()
+        self._descargando = {}  # (municipio, producto) -> Future de la primera descarga en curso
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _guardar(self, clave, data):
+        """Guarda una descarga; si su `elaborado` no cambia, conserva la entrada existente."""
+        elaborado = get_elaborado(data)
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and elaborado is not None and entrada["elaborado"] == elaborado:
+                entrada["obtenido"] = time.monotonic()
+            else:
+                entrada = {"data": data, "elaborado": elaborado, "obtenido": time.monotonic()}
+                self._entradas[clave] = entrada
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+            return entrada
+
+    def _refrescar(self, clave):
+        """Descarga de nuevo la predicción; si falla, se sigue sirviendo la anterior."""
+        try:
+            data = self.fetch(*clave)
+            if data:
+                self._guardar(clave, data)
+        finally:
+            with self._lock:
+                self._refrescando.discard(clave)
+
+    def get(self, municipio, producto="horaria"):
+        """Devuelve la predicción cacheada, descargándola solo si no hay ninguna en memoria."""
+        clave = (municipio, producto)
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                self._entradas.move_to_end(clave)
+                self.hits += 1
+                caducada = time.monotonic() - entrada["obtenido"] > self.ttl
+                if caducada and clave not in self._refrescando:
+                    self._refrescando.add(clave)
+                    threading.Thread(target=self._refrescar, args=(clave,), daemon=True).start()
+                return entrada["data"]
+            futuro = self._descargando.get(clave)
+            if futuro is not None:
+                # Otra sesión ya la está descargando: esperar a esa descarga
+                self.hits += 1
+                esperar = True
+            else:
+                futuro = self._descargando[clave] = Future()
+                self.misses += 1
+                esperar = False
+        if esperar:
+            return futuro.result()
+
+        # Sin dato en memoria: la primera petición tiene que esperar a AEMET
+        try:
+            data = self.fetch(municipio, producto)
+            data = self._guardar(clave, data)["data"] if data else None
+        except BaseException as error:
+            futuro.set_exception(error)
+            raise
+        else:
+            futuro.set_result(data)
+        finally:
+            # Sin descarga en curso: si ha fallado, la próxima petición lo vuelve a intentar
+            with self._lock:
+                self._descargando.pop(clave, None)
+        return data
+
+    def get_version(self, municipio, producto="horaria"):
+        """Devuelve el `elaborado` de la predicción en memoria, o None si no está cacheada."""
+        with self._lock:
+            entrada = self._entradas.get((municipio, producto))
+            return entrada["elaborado"] if entrada is not None else None
+
+    def invalidate(self, municipio=None, producto=None):
+        """Elimina entradas de la caché (todas si no se indica municipio ni producto)."""
+        with self._lock:
+            for clave in list(self._entradas):
+                if (municipio is None or clave[0] == municipio) and (producto is None or clave[1] == producto):
+                    del self._entradas[clave]
+
+    def estadisticas(self):
+        """Aciertos, fallos (descargas que hubo que esperar) y número de entradas."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entradas": len(self._entradas)}
+
+
+# Caché compartida por todas las sesiones del proceso
+forecast_cache = ForecastCache()
+
+
+def get_forecast(codigo_municipio, producto="horaria"):
+    """Obtiene la predicción de un municipio a través de la caché compartida."""
+    return forecast_cache.get(codigo_municipio, producto)
+
+
+# Hilos para pedir a la vez las predicciones horaria y diaria
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="forecast")
+
+
+def get_forecast_pair(codigo_municipio):
+    """Obtiene a la vez las predicciones horaria y diaria de un municipio a través de la caché compartida."""
+    diaria = _executor.submit(forecast_cache.get, codigo_municipio, "diaria")
+    horaria = forecast_cache.get(codigo_municipio, "horaria")
+    return horaria, diaria.result()
@@ -1,199 +1,85 @@
-import pandas as pd
-import re
+from .estado_cielo import SIN_ESTADO, estado_cielo
+from .frames import ProcesadorProducto, entero
 
-def extract_temperature(data):
-    """Extrae las temperaturas máximas, mínimas y el valor específico de cada intervalo de tiempo por día."""
-    temperature_data = {}
+# Columnas del DataFrame diario, en orden (fecha_hora es el inicio de cada periodo)
+COLUMNAS = [
+    "fecha", "periodo", "temperature_max", "temperature_min", "temperature_value",
+    "precipitation_value", "sky_value", "sky_description", "sky_severity", "wind_direction", "wind_speed",
+    "wind_gust", "fecha_hora",
+]
 
-    # Lista de periodos predeterminados
-    default_periods = ['00-06', '06-12', '12-18', '18-24']
+# Periodo que resume el día completo (los días lejanos no tienen datos por periodos de seis horas)
+PERIODO_DIA = "00-24"
 
-    for day in data:
-        day_data = {}
-        periods = day["temperatura"]["dato"]
-        fecha = day["fecha"]  # Asigna la fecha como clave principal
-
-        if periods:
-            for i, period in enumerate(periods):
-                # Define el periodo en formato de rango
-                if i == 0:
-                    period_key = "00-06"
-                else:
-                    start_hour = periods[i-1]["hora"]
-                    end_hour = period["hora"]
-                    period_key = f"{start_hour:02d}-{end_hour:02d}"
-
-                # Crea la entrada del periodo en el diccionario del día
-                if period_key not in day_data:
-                    day_data[period_key] = {
-                        "max": day["temperatura"]["maxima"],
-                        "min": day["temperatura"]["minima"],
-                        "value": period["value"]
-                    }
-        else:
-            # Si `periods` está vacío, crea los periodos predeterminados
-            for period_key in default_periods:
-                day_data[period_key] = {
-                    "max": day["temperatura"]["maxima"],
-                    "min": day["temperatura"]["minima"],
-                    "value": None
-                }
-
-        # Agrega el diccionario del día completo usando la fecha como clave
-        temperature_data[fecha] = day_data
-
-    return temperature_data
-
-
-def extract_precipitation(data):
-    """Extrae la probabilidad de precipitación por periodo de cada día."""
-    precipitation_data = {}
-
-    # Lista de periodos predeterminados
-    default_periods = ['00-24', '00-12', '12-24', '00-06', '06-12', '12-18', '18-24']
-
-    for day in data:
-        day_data = {}
-        periods = day.get("probPrecipitacion", [])
-        fecha = day["fecha"]  # Usa la fecha como clave principal
-
-        # Si hay periodos, procesa cada uno
-        if periods:
-            for period in periods:
-                # Verifica si el campo "periodo" está en el diccionario "period"
-                if "periodo" in period:
-                    period_key = period["periodo"]
-                    # Añade el valor de precipitación para el periodo si existe
-                    day_data[period_key] = {"value": period.get("value", None)}
-        
-        # Si algún periodo no está, agrega los periodos predeterminados
-        for period_key in default_periods:
-            # Añade periodos predeterminados si están ausentes en day_data
-            if period_key not in day_data:
-                day_data[period_key] = {"value": None}
-
-        # Agrega el diccionario del día completo usando la fecha como clave
-        precipitation_data[fecha] = day_data
-
-    return precipitation_data
 
-
-def extract_weather_conditions(data):
-    """Extrae la descripción de las condiciones del cielo por periodo de cada día."""
-    weather_conditions_data = {}
-
-    # Lista de periodos predeterminados
-    default_periods = ['00-24', '00-12', '12-24', '00-06', '06-12', '12-18', '18-24']
+def agregar_dias(columnas, data):
+    """
+    Recorre una sola vez los días de la predicción diaria y añade sus filas a `columnas`.
+    Escribe directamente las columnas, sin construir diccionarios intermedios por fila.
+    """
+    fecha_col, periodo_col = columnas["fecha"], columnas["periodo"]
+    t_max_col, t_min_col, t_col = columnas["temperature_max"], columnas["temperature_min"], columnas["temperature_value"]
+    lluvia_col = columnas["precipitation_value"]
+    cielo_col, descripcion_col = columnas["sky_value"], columnas["sky_description"]
+    severidad_col = columnas["sky_severity"]
+    direccion_col, velocidad_col = columnas["wind_direction"], columnas["wind_speed"]
+    racha_col = columnas["wind_gust"]
+    fecha_hora_col = columnas["fecha_hora"]
 
     for day in data:
-        day_data = {}
-        periods = day.get("estadoCielo", [])
-        fecha = day["fecha"]  # Usa la fecha como clave principal
+        fecha = day["fecha"]
+        dia = fecha[:10]
+        t_max, t_min = day["temperatura"]["maxima"], day["temperatura"]["minima"]
 
-        # Si hay periodos, procesa cada uno
+        # Temperatura de cada periodo de seis horas; sin ellos, una única fila para todo el día
+        temperaturas = {}
+        periods = day["temperatura"]["dato"]
         if periods:
-            for period in periods:
-                # Verifica si el campo "periodo" está en el diccionario "period"
-                if "periodo" in period:
-                    period_key = period["periodo"]
-                    # Extrae solo los dígitos del campo "value"
-                    value = period.get("value", None)
-                    if value:
-                        value = re.search(r'\d+', value).group() if re.search(r'\d+', value) else None
-                    
-                    # Añade la descripción y el valor para el periodo si existen
-                    day_data[period_key] = {
-                        "value": value,
-                        "descripcion": period.get("descripcion", None)
-                    }
-        
-        # Si algún periodo predeterminado falta, agrégalo con valores None
-        for period_key in default_periods:
-            if period_key not in day_data:
-                day_data[period_key] = {
-                    "value": None,
-                    "descripcion": None
-                }
-
-        # Agrega el diccionario del día completo usando la fecha como clave
-        weather_conditions_data[fecha] = day_data
-
-    return weather_conditions_data
-
-
-def extract_wind_data(data):
-    """Extrae la velocidad y dirección del viento por periodo de cada día."""
-    wind_data = {}
+            for i, period in enumerate(periods):
+                period_key = "00-06" if i == 0 else f"{periods[i-1]['hora']:02d}-{period['hora']:02d}"
+                temperaturas.setdefault(period_key, entero(period["value"]))
+        else:
+            temperaturas = {PERIODO_DIA: None}
 
-    # Lista de periodos predeterminados
-    default_periods = ['00-24', '00-12', '12-24', '00-06', '06-12', '12-18', '18-24']
+        # Los días lejanos traen un único valor sin "periodo", que corresponde al día completo
+        lluvia = {period.get("periodo", PERIODO_DIA): entero(period.get("value", None))
+                  for period in day.get("probPrecipitacion", [])}
 
-    for day in data:
-        day_data = {}
-        periods = day.get("viento", [])
-        fecha = day["fecha"]  # Usa la fecha como clave principal
+        cielo = {period.get("periodo", PERIODO_DIA): estado_cielo(period.get("value", None))
+                 for period in day.get("estadoCielo", [])}
 
-        # Si hay periodos, procesa cada uno
-        if periods:
-            for period in periods:
-                # Verifica si el campo "periodo" está en el diccionario "period"
-                period_key = period.get("periodo")
-                if period_key:
-                    # Añade la dirección y velocidad del viento para el periodo si existen
-                    day_data[period_key] = {
-                        "direccion": period.get("direccion", None),
-                        "velocidad": period.get("velocidad", None)
-                    }
+        viento = {period.get("periodo") or PERIODO_DIA: (period.get("direccion", None) or None, entero(period.get("velocidad", None)))
+                  for period in day.get("viento", [])}
 
-        # Si algún periodo predeterminado falta, agrégalo con valores None
-        for period_key in default_periods:
-            if period_key not in day_data:
-                day_data[period_key] = {
-                    "direccion": None,
-                    "velocidad": None
-                }
+        rachas = {period.get("periodo", PERIODO_DIA): entero(period.get("value", None))
+                  for period in day.get("rachaMax", [])}
 
-        # Agrega el diccionario del día completo usando la fecha como clave
-        wind_data[fecha] = day_data
+        for period_key, value in temperaturas.items():
+            fecha_col.append(fecha)
+            periodo_col.append(period_key)
+            t_max_col.append(t_max)
+            t_min_col.append(t_min)
+            t_col.append(value)
+            lluvia_col.append(lluvia.get(period_key))
+            sky_value, _, sky_severity, sky_description = cielo.get(period_key, SIN_ESTADO)
+            cielo_col.append(sky_value)
+            descripcion_col.append(sky_description)
+            severidad_col.append(sky_severity)
+            wind_direction, wind_speed = viento.get(period_key, (None, None))
+            direccion_col.append(wind_direction)
+            velocidad_col.append(wind_speed)
+            racha_col.append(rachas.get(period_key))
+            # El periodo se sitúa en su hora de inicio
+            fecha_hora_col.append(f"{dia} {period_key[:2]}:00")
 
-    return wind_data
 
-def extract_uv_index(data):
-    """Extrae el índice UV máximo por periodo de cada día."""
+# Construcción común del DataFrame diario (también la usa pipeline.process_weather_week_batch)
+PROCESADOR = ProcesadorProducto(COLUMNAS, agregar_dias)
 
 
 def process_weather_data(data):
     """
-    Procesa los datos completos del tiempo, llamando a cada función de extracción
-    y organizando la información en un DataFrame para facilitar el análisis.
+    Procesa los datos completos del tiempo en una sola pasada, escribiendo directamente
+    las columnas del DataFrame para facilitar el análisis.
     """
-    # Extrae datos individuales de cada aspecto del clima
-    temperature_data = extract_temperature(data)
-    precipitation_data = extract_precipitation(data)
-    weather_conditions_data = extract_weather_conditions(data)
-    wind_data = extract_wind_data(data)
-
-    # Lista para almacenar todas las filas antes de convertir a DataFrame
-    rows = []
-
-    # Itera sobre las fechas y periodos para organizar los datos en filas
-    for fecha in temperature_data:
-        for period_key in temperature_data[fecha]:
-            row = {
-                "fecha": fecha,
-                "periodo": period_key,
-                "temperature_max": temperature_data[fecha][period_key].get("max"),
-                "temperature_min": temperature_data[fecha][period_key].get("min"),
-                "temperature_value": temperature_data[fecha][period_key].get("value"),
-                "precipitation_value": precipitation_data[fecha].get(period_key, {}).get("value"),
-                "sky_value": weather_conditions_data[fecha].get(period_key, {}).get("value"),
-                "sky_description": weather_conditions_data[fecha].get(period_key, {}).get("descripcion"),
-                "wind_direction": wind_data[fecha].get(period_key, {}).get("direccion"),
-                "wind_speed": wind_data[fecha].get(period_key, {}).get("velocidad")
-            }
-            rows.append(row)
-
-    # Convertir la lista de filas a un DataFrame
-    weather_df = pd.DataFrame(rows)
-
-    return weather_df
+    return PROCESADOR.procesar(data)
@@ -0,0 +1,56 @@
+# Códigos del estado del cielo de AEMET: código -> descripción, ordenados de menor a mayor severidad.
+# AEMET añade el sufijo "n" a la variante nocturna del mismo código (p. ej. "12n").
+CODIGOS_CIELO = {
+    11: "Despejado",
+    12: "Poco nuboso",
+    17: "Nubes altas",
+    13: "Intervalos nubosos",
+    14: "Nuboso",
+    15: "Muy nuboso",
+    16: "Cubierto",
+    82: "Bruma",
+    83: "Calima",
+    81: "Niebla",
+    43: "Intervalos nubosos con lluvia escasa",
+    44: "Nuboso con lluvia escasa",
+    45: "Muy nuboso con lluvia escasa",
+    46: "Cubierto con lluvia escasa",
+    23: "Intervalos nubosos con lluvia",
+    24: "Nuboso con lluvia",
+    25: "Muy nuboso con lluvia",
+    26: "Cubierto con lluvia",
+    71: "Intervalos nubosos con nieve escasa",
+    72: "Nuboso con nieve escasa",
+    73: "Muy nuboso con nieve escasa",
+    74: "Cubierto con nieve escasa",
+    33: "Intervalos nubosos con nieve",
+    34: "Nuboso con nieve",
+    35: "Muy nuboso con nieve",
+    36: "Cubierto con nieve",
+    61: "Intervalos nubosos con tormenta y lluvia escasa",
+    62: "Nuboso con tormenta y lluvia escasa",
+    63: "Muy nuboso con tormenta y lluvia escasa",
+    64: "Cubierto con tormenta y lluvia escasa",
+    51: "Intervalos nubosos con tormenta",
+    52: "Nuboso con tormenta",
+    53: "Muy nuboso con tormenta",
+    54: "Cubierto con tormenta",
+}
+
+# Descripciones en orden de severidad (sirven como categorías ordenadas del DataFrame)
+DESCRIPCIONES_CIELO = list(CODIGOS_CIELO.values())
+
+# Valor de AEMET ("12", "12n") -> (código, nocturno, severidad, descripción).
+# Las descripciones son las mismas cadenas para todas las filas, sin copias por periodo.
+ESTADOS_CIELO = {}
+for severidad, (codigo, descripcion) in enumerate(CODIGOS_CIELO.items(), start=1):
+    ESTADOS_CIELO[str(codigo)] = (codigo, False, severidad, descripcion)
+    ESTADOS_CIELO[f"{codigo}n"] = (codigo, True, severidad, descripcion)
+
+# Estado sin dato (AEMET envía "" en los periodos sin predicción)
+SIN_ESTADO = (None, None, None, None)
+
+
+def estado_cielo(value):
+    """Devuelve (código, nocturno, severidad, descripción) de un valor de estadoCielo de AEMET."""
+    return ESTADOS_CIELO.get(value, SIN_ESTADO)
@@ -0,0 +1,153 @@
+import argparse, os, sys, time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pyarrow as pa
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+
+from .bulk_fetch import PETICIONES_POR_SEGUNDO, WORKERS, prefetch
+from .municipios import municipios_provincias
+from .pipeline import get_dias, process_weather_week_batch
+from .resumen import resumen_diario
+from .store import cargar_prediccion, ruta_prediccion
+
+# Municipios que procesa cada tarea del pool (y filas que se escriben de una vez)
+MUNICIPIOS_POR_LOTE = 50
+FORMATOS = ("csv", "parquet")
+
+
+def procesar_lote(codigos, producto="semanal", data_dir=None):
+    """
+    Procesa las predicciones guardadas en disco de un lote de municipios y devuelve una tabla de Arrow
+    con la columna `municipio` (None si ningún municipio tiene predicción). Se ejecuta en el pool de procesos.
+    """
+    payloads = {}
+    for codigo in codigos:
+        horaria, diaria = cargar_prediccion(codigo, "horaria", data_dir), cargar_prediccion(codigo, "diaria", data_dir)
+        if horaria or diaria:
+            payloads[codigo] = (get_dias(horaria), get_dias(diaria))
+    if not payloads:
+        return None
+    batch_df = process_weather_week_batch(payloads)
+    if producto == "resumen":
+        batch_df = resumen_diario(batch_df)
+    tabla = pa.Table.from_pandas(batch_df.reset_index(), preserve_index=False)
+    # Las categorías cambian de un lote a otro: se exportan como texto para que todos compartan esquema
+    return tabla.cast(pa.schema([
+        pa.field(campo.name, campo.type.value_type) if pa.types.is_dictionary(campo.type) else campo
+        for campo in tabla.schema
+    ]))
+
+
+class Escritor:
+    """Escribe en un CSV o en un Parquet las tablas que van llegando, sin tenerlas todas en memoria."""
+
+    def __init__(self, salida, formato):
+        self.salida = salida
+        self.formato = formato
+        self._writer = None
+        self.schema = None
+        self.filas = 0
+
+    def escribir(self, tabla):
+        if self._writer is None:
+            self.schema = tabla.schema
+            os.makedirs(os.path.dirname(os.path.abspath(self.salida)), exist_ok=True)
+            if self.formato == "parquet":
+                self._writer = pq.ParquetWriter(self.salida, tabla.schema, compression="zstd")
+            else:
+                self._writer = pv.CSVWriter(self.salida, tabla.schema)
+        self._writer.write_table(tabla.cast(self.schema))
+        self.filas += tabla.num_rows
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def exportar(codigos, salida, formato=None, producto="semanal", workers=None, municipios_por_lote=MUNICIPIOS_POR_LOTE,
+             descargar=True, peticiones_por_segundo=PETICIONES_POR_SEGUNDO, progreso=None):
+    """
+    Exporta las predicciones procesadas de `codigos` a `salida` (CSV o Parquet, según la extensión).
+
+    Los municipios se reparten en lotes que se procesan en un pool de procesos; a la vez solo hay
+    unos pocos lotes en vuelo y cada uno se escribe en cuanto termina, así que la memoria no crece
+    con el número de municipios. Las predicciones se leen de las guardadas en disco por refresher.py
+    y, con `descargar`, las que falten se descargan antes de procesar su lote.
+    Devuelve (filas escritas, municipios sin predicción).
+    """
+    formato = formato or os.path.splitext(salida)[1].lstrip(".").lower()
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no soportado: {formato!r} (usa {', '.join(FORMATOS)})")
+    codigos = list(codigos)
+    lotes = [codigos[i:i + municipios_por_lote] for i in range(0, len(codigos), municipios_por_lote)]
+    workers = workers or os.cpu_count() or 1
+
+    escritor = Escritor(salida, formato)
+    sin_datos = []
+    en_vuelo = deque()
+    hechos = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for lote in lotes + [None]:
+                if lote is not None:
+                    if descargar:
+                        # Descarga (con el límite global de peticiones) solo lo que no está en disco
+                        for producto_aemet in ("horaria", "diaria"):
+                            faltan = [c for c in lote if not os.path.exists(ruta_prediccion(c, producto_aemet))]
+                            if faltan:
+                                prefetch(faltan, producto_aemet, min(WORKERS, len(faltan)), peticiones_por_segundo)
+                    en_vuelo.append((lote, executor.submit(procesar_lote, lote, producto)))
+                # Escribir los lotes terminados en orden, con como mucho dos lotes por proceso en vuelo
+                while en_vuelo and (lote is None or len(en_vuelo) >= 2 * workers or en_vuelo[0][1].done()):
+                    lote_hecho, futuro = en_vuelo.popleft()
+                    tabla = futuro.result()
+                    procesados = set() if tabla is None else set(tabla["municipio"].unique().to_pylist())
+                    sin_datos.extend(codigo for codigo in lote_hecho if codigo not in procesados)
+                    if tabla is not None:
+                        escritor.escribir(tabla)
+                    hechos += len(lote_hecho)
+                    if progreso is not None:
+                        progreso(hechos, len(codigos), escritor.filas)
+    finally:
+        escritor.close()
+    return escritor.filas, sin_datos
+
+
+def mostrar_progreso(hechos, total, filas):
+    """Muestra el progreso de la exportación en la terminal."""
+    print(f"\r[{hechos}/{total}] {filas} filas", end="", file=sys.stderr, flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta a CSV o Parquet las predicciones procesadas de varios municipios.")
+    parser.add_argument("codigos", nargs="*", help="códigos INE de los municipios")
+    parser.add_argument("--provincias", nargs="+", default=[], help="exporta todos los municipios de estas provincias")
+    parser.add_argument("--salida", required=True, help="fichero de salida (.csv o .parquet)")
+    parser.add_argument("--formato", choices=FORMATOS, help="formato de salida (por defecto, según la extensión)")
+    parser.add_argument("--producto", choices=["semanal", "resumen"], default="semanal",
+                        help="predicción semanal por horas o resumen por días")
+    parser.add_argument("--workers", type=int, default=None, help="procesos del pool (por defecto, uno por CPU)")
+    parser.add_argument("--lote", type=int, default=MUNICIPIOS_POR_LOTE, help="municipios por tarea")
+    parser.add_argument("--sin-descargar", action="store_true",
+                        help="usa solo las predicciones ya guardadas en disco, sin llamar a AEMET")
+    parser.add_argument("--peticiones-por-segundo", type=float, default=PETICIONES_POR_SEGUNDO,
+                        help="límite global de peticiones a AEMET")
+    args = parser.parse_args()
+
+    codigos = list(dict.fromkeys([*args.codigos, *municipios_provincias(args.provincias)])) if args.provincias else args.codigos
+    if not codigos:
+        parser.error("indica códigos de municipio o --provincias")
+    inicio = time.perf_counter()
+    filas, sin_datos = exportar(codigos, args.salida, args.formato, args.producto, args.workers, args.lote,
+                                not args.sin_descargar, args.peticiones_por_segundo, mostrar_progreso)
+    print(f"\n{filas} filas de {len(codigos) - len(sin_datos)} municipios en {args.salida} "
+          f"({time.perf_counter() - inicio:.1f} s)", file=sys.stderr)
+    for codigo in sin_datos:
+        print(f"{codigo}\tsin predicción")
+    return 1 if sin_datos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+import json, os
+
+import plotly.graph_objects as go
+
+from .version_cache import VersionCache
+
+# Tamaño máximo (en bytes de JSON) de las figuras guardadas en memoria
+FIGURE_CACHE_BYTES = int(os.getenv("FIGURE_CACHE_BYTES", 64 * 1024 * 1024))
+
+
+class FigureCache(VersionCache):
+    """
+    Caché de figuras de Plotly serializadas a JSON, por (versión de la predicción, tipo de gráfico).
+
+    Cada sesión recibe su propia figura reconstruida a partir del JSON, así que puede modificarla
+    sin afectar a las demás.
+    """
+
+    def __init__(self, max_bytes=FIGURE_CACHE_BYTES):
+        super().__init__(max_bytes)
+
+    def get(self, version, tipo, build):
+        """Devuelve la figura de (version, tipo); si no está en memoria, la construye con `build()`."""
+        construida = []
+
+        def construir():
+            fig = build()
+            construida.append(fig)
+            return fig.to_json()
+
+        figura_json = super().get(version, tipo, construir)
+        if construida:
+            return construida[0]
+        # El JSON ya es una figura válida: se reconstruye sin volver a validar cada propiedad
+        return go.Figure(json.loads(figura_json), _validate=False)
+
+
+# Caché compartida por todas las sesiones del proceso
+figure_cache = FigureCache()
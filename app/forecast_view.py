@@ -0,0 +1,40 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+
+class ForecastView:
+    """
+    Vista de solo lectura sobre un DataFrame de predicción ordenado por `fecha_hora`.
+
+    La fila más cercana al momento actual se busca una sola vez (búsqueda binaria) al crear
+    la vista y todos los valores "actuales" salen de esa fila. El DataFrame no se modifica,
+    así que puede compartirse entre sesiones y cachearse.
+    """
+
+    def __init__(self, weather_df, ahora=None):
+        self.weather_df = weather_df
+        self.ahora = pd.Timestamp(ahora if ahora is not None else datetime.now())
+        self.posicion = self._fila_mas_cercana()
+
+    def _fila_mas_cercana(self):
+        """Posición de la fila con la `fecha_hora` más cercana a `ahora` (la primera si hay empate)."""
+        fechas = self.weather_df["fecha_hora"].to_numpy()
+        if len(fechas) == 0:
+            return None
+        ahora = self.ahora.to_datetime64()
+        posicion = int(np.searchsorted(fechas, ahora))
+        if posicion == len(fechas) or (posicion > 0 and ahora - fechas[posicion - 1] <= fechas[posicion] - ahora):
+            posicion -= 1
+        # Con fechas repetidas, la primera fila de esa fecha
+        return int(np.searchsorted(fechas, fechas[posicion]))
+
+    @property
+    def actual(self):
+        """Fila más cercana al momento actual (None si el DataFrame está vacío)."""
+        return None if self.posicion is None else self.weather_df.iloc[self.posicion]
+
+    def get(self, column):
+        """Valor de `column` en la fila más cercana al momento actual."""
+        return None if self.posicion is None else self.weather_df[column].iat[self.posicion]
@@ -0,0 +1,71 @@
+import os
+
+from .cache import get_elaborado, get_forecast_pair
+from .pipeline import get_dias, process_weather_week
+from .resumen import resumen_diario
+from .store import cargar_frame, cargar_version
+from .version_cache import VersionCache
+
+# Tamaño máximo (en bytes de memoria de los DataFrames) de las predicciones procesadas en memoria
+FRAME_CACHE_BYTES = int(os.getenv("FRAME_CACHE_BYTES", 256 * 1024 * 1024))
+
+
+def tamano_frames(frames):
+    """Memoria ocupada por una tupla de DataFrames."""
+    return sum(int(df.memory_usage(index=True, deep=True).sum()) for df in frames if df is not None)
+
+
+class FrameCache(VersionCache):
+    """
+    Caché de las predicciones ya procesadas (DataFrame semanal y resumen diario) por versión.
+
+    Los DataFrames se comparten entre sesiones sin copiarlos: quien los use no debe modificarlos.
+    """
+
+    def __init__(self, max_bytes=FRAME_CACHE_BYTES):
+        super().__init__(max_bytes, tamano_frames)
+
+
+# Caché compartida por todas las sesiones del proceso
+frame_cache = FrameCache()
+
+
+def _procesar(horaria, diaria):
+    weather_df = process_weather_week(get_dias(horaria), get_dias(diaria))
+    return weather_df, resumen_diario(weather_df)
+
+
+def cargar_publicada(codigo_municipio):
+    """
+    Devuelve (weather_df, resumen_df, versión) de lo publicado por refresher.py para un municipio,
+    o (None, None, None) si no está publicado. Nunca llama a AEMET.
+    """
+    version = cargar_version(codigo_municipio, "semanal")
+    if version is not None:
+        weather_df, resumen_df = frame_cache.get(version, "semanal", lambda: (
+            cargar_frame(codigo_municipio, "semanal"), cargar_frame(codigo_municipio, "resumen")))
+        if weather_df is not None:
+            return weather_df, resumen_df, version
+        frame_cache.invalidate(version)  # Manifiesto sin DataFrame publicado: no guardar el vacío
+    return None, None, None
+
+
+def cargar_prediccion(codigo_municipio):
+    """
+    Devuelve (weather_df, resumen_df, versión) de un municipio, o (None, None, None) si no hay datos.
+
+    Primero se usa lo publicado por refresher.py; si no existe, se descargan las predicciones (desde
+    la caché de predicciones) y se procesan. En ambos casos el resultado se guarda por versión, así que
+    todas las sesiones que ven el mismo municipio comparten una sola carga o un solo procesado.
+    """
+    weather_df, resumen_df, version = cargar_publicada(codigo_municipio)
+    if weather_df is not None:
+        return weather_df, resumen_df, version
+
+    # Obtener las predicciones horaria y diaria (desde la caché compartida) y procesarlas juntas
+    horaria, diaria = get_forecast_pair(codigo_municipio)
+    if not (horaria or diaria):
+        return None, None, None
+    version = (codigo_municipio, get_elaborado(horaria), get_elaborado(diaria))
+    weather_df, resumen_df = frame_cache.get(version, "semanal", lambda: _procesar(horaria, diaria))
+    return weather_df, resumen_df, version
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+from .estado_cielo import DESCRIPCIONES_CIELO
+
+# Direcciones del viento de AEMET (C = calma)
+DIRECCIONES_VIENTO = ["N", "NE", "E", "SE", "S", "SO", "O", "NO", "C"]
+
+# Tipos de las columnas de los DataFrames de predicción (horaria y diaria). Las probabilidades,
+# velocidades y códigos de cielo son enteros pequeños con nulos; los textos repetidos, categorías.
+ESQUEMA = {
+    "periodo": "category",
+    "temperature_max": pd.Int8Dtype(),
+    "temperature_min": pd.Int8Dtype(),
+    "temperature_value": pd.Int8Dtype(),
+    "precipitation_value": pd.UInt8Dtype(),
+    "sky_value": pd.UInt8Dtype(),
+    "sky_description": pd.CategoricalDtype(DESCRIPCIONES_CIELO, ordered=True),  # Ordenadas por severidad
+    "sky_severity": pd.UInt8Dtype(),
+    "wind_direction": pd.CategoricalDtype(DIRECCIONES_VIENTO),
+    "wind_speed": pd.UInt8Dtype(),
+    "wind_gust": pd.UInt8Dtype(),
+    "storm_probability": pd.UInt8Dtype(),
+}
+
+
+def entero(value, default=None):
+    """Convierte un valor de AEMET ("15", 15, "") a entero, o devuelve `default` si no es numérico."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def aplicar_esquema(weather_df):
+    """
+    Convierte las columnas del DataFrame a los tipos de ESQUEMA, calcula `fecha` como el día
+    de `fecha_hora` y usa `fecha_hora` como índice (DatetimeIndex).
+    """
+    weather_df["fecha"] = weather_df["fecha_hora"].dt.normalize()
+    for columna, dtype in ESQUEMA.items():
+        if columna in weather_df:
+            weather_df[columna] = weather_df[columna].astype(dtype)
+    weather_df.index = pd.DatetimeIndex(weather_df["fecha_hora"]).rename(None)
+    return weather_df
+
+
+def columna_municipio(codigos, filas, categorias=None):
+    """Columna categórica `municipio` con cada código repetido tantas veces como filas tiene."""
+    categorias = categorias if categorias is not None else sorted(set(codigos))
+    posiciones = {codigo: i for i, codigo in enumerate(categorias)}
+    codes = np.repeat(np.array([posiciones[codigo] for codigo in codigos], dtype=np.int32), filas)
+    return pd.Categorical.from_codes(codes, categories=categorias)
+
+
+class ProcesadorProducto:
+    """
+    Construye el DataFrame de un producto de AEMET (horaria o diaria) escribiendo directamente sus
+    columnas, sin diccionarios intermedios por fila. Cada módulo indica sus `columnas` y la función
+    `agregar_dias(columnas, dias)` que añade a esas listas las filas de los días; el resto es común.
+    """
+
+    def __init__(self, columnas, agregar_dias):
+        self.columnas = columnas
+        self.agregar_dias = agregar_dias
+
+    def nuevas_columnas(self):
+        """Crea las columnas vacías del DataFrame."""
+        return {columna: [] for columna in self.columnas}
+
+    def a_frame(self, columnas):
+        """Convierte las columnas acumuladas en el DataFrame con los tipos del esquema."""
+        weather_df = pd.DataFrame(columnas, columns=self.columnas)
+        # Una única conversión vectorizada para la columna de fecha y hora combinada
+        weather_df["fecha_hora"] = pd.to_datetime(weather_df["fecha_hora"], format="%Y-%m-%d %H:%M")
+        return aplicar_esquema(weather_df)
+
+    def procesar(self, dias):
+        """Procesa los días de una predicción y devuelve su DataFrame."""
+        columnas = self.nuevas_columnas()
+        self.agregar_dias(columnas, dias)
+        return self.a_frame(columnas)
@@ -0,0 +1,124 @@
+import argparse, json, os, unicodedata
+from functools import lru_cache
+
+import requests
+
+# Rutas del diccionario de municipios incluido en el repositorio
+MUNICIPIOS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "municipios")
+EXCEL_PATH = os.path.join(MUNICIPIOS_DIR, "municipios.xlsx")
+INDICE_PATH = os.path.join(MUNICIPIOS_DIR, "indice_municipios.json")
+
+# Diccionario de municipios publicado por el INE
+INE_URL = "https://www.ine.es/daco/daco42/codmun/diccionario24.xlsx"
+
+# Provincias de la Comunidad Valenciana: tienen prioridad cuando un nombre se repite en otra provincia
+PROVINCIAS_CV = {"03": "Alicante", "12": "Castellón", "46": "Valencia"}
+
+# Artículos que el INE pospone al nombre ("Campello, el", "Eliana, l'")
+ARTICULOS = ("el", "la", "els", "les", "los", "las", "l'")
+
+
+def normalizar_nombre(nombre):
+    """Normaliza un nombre de municipio: sin acentos, en minúsculas y con espacios simples."""
+    nombre = unicodedata.normalize("NFKD", str(nombre).replace("’", "'"))
+    nombre = "".join(c for c in nombre if not unicodedata.combining(c))
+    return " ".join(nombre.lower().split())
+
+
+def alias_nombre(nombre):
+    """Genera las variantes de un nombre oficial: cada nombre bilingüe y la forma con el artículo delante."""
+    alias = []
+    for parte in nombre.split("/"):
+        parte = parte.strip()
+        alias.append(parte)
+        # "Alfàs del Pi, l'" -> "l'Alfàs del Pi"; "Campello, el" -> "el Campello"
+        if ", " in parte:
+            base, articulo = parte.rsplit(", ", 1)
+            if articulo.lower() in ARTICULOS:
+                separador = "" if articulo.endswith("'") else " "
+                alias.append(f"{articulo}{separador}{base}")
+                alias.append(base)
+    return alias
+
+
+def construir_indice(excel_path=EXCEL_PATH, indice_path=INDICE_PATH):
+    """Genera el índice compacto (código, nombre) a partir del Excel del INE y lo guarda en disco."""
+    import pandas as pd  # Solo se necesita al regenerar el índice
+
+    df = pd.read_excel(excel_path, header=1)  # La fila 2 tiene los nombres de las columnas
+    codigos = df["CPRO"].astype(str).str.zfill(2) + df["CMUN"].astype(str).str.zfill(3)
+    municipios = [[codigo, nombre] for codigo, nombre in zip(codigos, df["NOMBRE"])]
+
+    indice = {"fuente": os.path.basename(excel_path), "municipios": municipios}
+    with open(indice_path, "w", encoding="utf-8") as f:
+        json.dump(indice, f, ensure_ascii=False, separators=(",", ":"))
+    return indice
+
+
+@lru_cache(maxsize=None)
+def cargar_indice():
+    """Carga el índice de municipios una sola vez por proceso y construye el diccionario de búsqueda."""
+    if os.path.exists(INDICE_PATH):
+        with open(INDICE_PATH, encoding="utf-8") as f:
+            indice = json.load(f)
+    else:
+        indice = construir_indice()
+
+    # Los municipios valencianos van primero para resolver nombres repetidos (p. ej. "Torrent")
+    municipios = sorted(indice["municipios"], key=lambda m: m[0][:2] not in PROVINCIAS_CV)
+
+    claves = {}
+    # Primero los nombres oficiales completos: tienen prioridad sobre cualquier alias
+    for codigo, nombre in municipios:
+        claves.setdefault(normalizar_nombre(nombre), codigo)
+    for codigo, nombre in municipios:
+        for alias in alias_nombre(nombre):
+            claves.setdefault(normalizar_nombre(alias), codigo)
+    return claves
+
+
+@lru_cache(maxsize=None)
+def nombres_municipios():
+    """Devuelve un diccionario código -> nombre oficial de todos los municipios del índice."""
+    if not os.path.exists(INDICE_PATH):
+        construir_indice()
+    with open(INDICE_PATH, encoding="utf-8") as f:
+        return dict(json.load(f)["municipios"])
+
+
+def municipios_provincias(provincias=tuple(PROVINCIAS_CV)):
+    """Devuelve un diccionario código -> nombre con los municipios de las provincias indicadas."""
+    provincias = {str(p).zfill(2) for p in provincias}
+    return {codigo: nombre for codigo, nombre in nombres_municipios().items() if codigo[:2] in provincias}
+
+
+def buscar_codigo(nombre):
+    """Devuelve el código INE (CPRO + CMUN) del municipio, o None si no existe."""
+    return cargar_indice().get(normalizar_nombre(nombre))
+
+
+def descargar_diccionario(url=INE_URL, excel_path=EXCEL_PATH):
+    """Descarga el diccionario de municipios del INE y sustituye el Excel incluido."""
+    response = requests.get(url, timeout=(5, 60))
+    response.raise_for_status()
+    with open(excel_path, "wb") as f:
+        f.write(response.content)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regenera el índice de municipios a partir del diccionario del INE.")
+    parser.add_argument("--actualizar", action="store_true",
+                        help="descarga antes la última versión del diccionario publicada por el INE")
+    parser.add_argument("--url", default=INE_URL, help="URL del diccionario del INE")
+    args = parser.parse_args()
+
+    if args.actualizar:
+        descargar_diccionario(args.url)
+    indice = construir_indice()
+    cargar_indice.cache_clear()
+    nombres_municipios.cache_clear()
+    print(f"Índice generado con {len(indice['municipios'])} municipios en {INDICE_PATH}")
+
+
+if __name__ == "__main__":
+    main()
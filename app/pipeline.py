@@ -0,0 +1,151 @@
+import hashlib, json
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson  # Opcional: serialización más rápida para calcular las huellas de los días
+except ImportError:
+    orjson = None
+
+from . import data_processing_day, data_processing_hour
+from .data_processing_day import PERIODO_DIA, process_weather_data as process_daily_data
+from .data_processing_hour import process_weather_data as process_hourly_data
+from .frames import aplicar_esquema, columna_municipio
+
+# Resolución temporal de cada fila del DataFrame semanal
+RESOLUCIONES = pd.CategoricalDtype(["hourly", "6-hourly", "daily"])
+DURACIONES = {"hourly": np.timedelta64(1, "h"), "6-hourly": np.timedelta64(6, "h"), "daily": np.timedelta64(24, "h")}
+
+
+def get_dias(data):
+    """Devuelve la lista `prediccion.dia` de una respuesta de AEMET (vacía si no hay datos)."""
+    return data[0]["prediccion"]["dia"] if data else []
+
+
+def _combinar(hourly_df, daily_df):
+    """
+    Une los DataFrames horario y diario (de uno o de varios municipios, con la columna `municipio`)
+    añadiendo `resolution`. Donde hay predicción horaria se usan sus filas en lugar de las de la diaria.
+    """
+    hourly_df.insert(hourly_df.columns.get_loc("fecha_hora"), "resolution", "hourly")
+    daily_df.insert(daily_df.columns.get_loc("fecha_hora"), "resolution",
+                    np.where(daily_df["periodo"] == PERIODO_DIA, "daily", "6-hourly"))
+
+    if not hourly_df.empty and not daily_df.empty:
+        # La predicción horaria de cada municipio es un bloque continuo de horas [primera, última + 1h)
+        if "municipio" in hourly_df:
+            horas = hourly_df["fecha_hora"].groupby(hourly_df["municipio"].cat.codes)
+            municipios = pd.Series(daily_df["municipio"].cat.codes)
+            primera = municipios.map(horas.min()).to_numpy(dtype=hourly_df["fecha_hora"].dtype)
+            ultima = municipios.map(horas.max()).to_numpy(dtype=hourly_df["fecha_hora"].dtype)
+        else:
+            horas = hourly_df["fecha_hora"].to_numpy()
+            primera, ultima = horas.min(), horas.max()
+        fin_horaria = ultima + DURACIONES["hourly"]
+        inicio = daily_df["fecha_hora"].to_numpy()
+        fin = inicio + np.where(daily_df["resolution"] == "daily", DURACIONES["daily"], DURACIONES["6-hourly"])
+
+        # Los periodos que se solapan con el bloque horario (empiecen antes o dentro de él) y acaban
+        # después pasan a empezar donde termina la predicción horaria; los demás se descartan
+        solapa = (inicio < fin_horaria) & (fin > primera)
+        sigue = solapa & (fin > fin_horaria)
+        daily_df = daily_df.assign(fecha_hora=np.where(sigue, fin_horaria, inicio))
+        daily_df = daily_df[~solapa | sigue]
+
+    weather_df = pd.concat([hourly_df, daily_df])
+    orden = ["municipio", "fecha_hora"] if "municipio" in weather_df else "fecha_hora"
+    weather_df = weather_df.sort_values(orden, kind="stable")
+    weather_df["resolution"] = weather_df["resolution"].astype(RESOLUCIONES)
+    return aplicar_esquema(weather_df)
+
+
+def process_weather_week(horaria, diaria):
+    """
+    Procesa en una misma pasada los días de la predicción horaria y de la diaria y devuelve
+    un único DataFrame de siete días con la columna `resolution` (hourly, 6-hourly o daily).
+    Donde hay predicción horaria se usan sus filas en lugar de las de la diaria.
+    """
+    return _combinar(process_hourly_data(horaria), process_daily_data(diaria))
+
+
+def hash_dia(day):
+    """Huella de una entrada `dia` de AEMET; cambia si cambia cualquiera de sus valores."""
+    contenido = orjson.dumps(day) if orjson is not None else json.dumps(day, separators=(",", ":")).encode("utf-8")
+    return hashlib.blake2b(contenido, digest_size=16).digest()
+
+
+class DiasProcesados:
+    """
+    Filas ya extraídas de cada día de la última predicción de cada (municipio, producto), por huella.
+
+    AEMET vuelve a publicar los siete días en cada actualización aunque la mayoría no cambien:
+    los días con la misma huella que en la predicción anterior reutilizan sus filas y solo se
+    extraen los que han cambiado. Solo se guarda la última predicción de cada municipio.
+    """
+
+    def __init__(self):
+        self._dias = {}  # (municipio, producto) -> {huella: columnas del día}
+        self.extraidos = 0
+        self.reutilizados = 0
+
+    def agregar(self, columnas, procesador, codigo_municipio, producto, data):
+        """Añade a `columnas` las filas de los días de `data`, extrayendo solo los días nuevos."""
+        anteriores = self._dias.get((codigo_municipio, producto), {})
+        actuales = {}
+        for day in data:
+            huella = hash_dia(day)
+            filas = anteriores.get(huella)
+            if filas is None:
+                filas = procesador.nuevas_columnas()
+                procesador.agregar_dias(filas, [day])
+                self.extraidos += 1
+            else:
+                self.reutilizados += 1
+            actuales[huella] = filas
+            for columna, valores in filas.items():
+                columnas[columna].extend(valores)
+        self._dias[(codigo_municipio, producto)] = actuales
+
+
+# Productos del DataFrame semanal, en el orden de los pares (horaria, diaria) de los payloads
+PRODUCTOS = (("horaria", data_processing_hour.PROCESADOR), ("diaria", data_processing_day.PROCESADOR))
+
+
+def process_weather_week_batch(payloads, dias_procesados=None, errores=None):
+    """
+    Procesa las predicciones semanales de varios municipios ({codigo: (horaria, diaria)} con los
+    días de cada producto) en un único DataFrame con índice (municipio, fecha_hora). Con
+    `dias_procesados` solo se extraen los días que han cambiado desde la predicción anterior.
+
+    Con un diccionario `errores`, los municipios cuya predicción no se puede procesar (días con
+    campos que faltan o valores inesperados) se dejan fuera y se anotan en él, en lugar de
+    interrumpir todo el lote.
+    """
+    dias_procesados = dias_procesados or DiasProcesados()
+    columnas = [procesador.nuevas_columnas() for _, procesador in PRODUCTOS]
+    codigos, filas = [], [[] for _ in PRODUCTOS]
+    for codigo, dias in payloads.items():
+        antes = [len(columnas_producto["fecha"]) for columnas_producto in columnas]
+        try:
+            for posicion, (producto, procesador) in enumerate(PRODUCTOS):
+                dias_procesados.agregar(columnas[posicion], procesador, codigo, producto, dias[posicion])
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            if errores is None:
+                raise
+            errores[codigo] = f"Predicción ilegible: {e!r}"
+            # Quitar las filas que el municipio haya llegado a añadir
+            for columnas_producto, filas_antes in zip(columnas, antes):
+                for valores in columnas_producto.values():
+                    del valores[filas_antes:]
+            continue
+        codigos.append(codigo)
+        for posicion, columnas_producto in enumerate(columnas):
+            filas[posicion].append(len(columnas_producto["fecha"]) - antes[posicion])
+
+    frames = []
+    for (_, procesador), columnas_producto, filas_producto in zip(PRODUCTOS, columnas, filas):
+        product_df = procesador.a_frame(columnas_producto)
+        product_df.insert(0, "municipio", columna_municipio(codigos, filas_producto, sorted(codigos)))
+        frames.append(product_df)
+    return _combinar(*frames).set_index(["municipio", "fecha_hora"])
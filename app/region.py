@@ -0,0 +1,105 @@
+import io, os, threading
+
+import numpy as np
+import pandas as pd
+
+from .municipios import nombres_municipios
+from .pipeline import DURACIONES
+from .store import DATA_DIR, escribir_atomico
+
+# Variables de la vista regional: columna del DataFrame semanal -> título
+VARIABLES_REGION = {
+    "precipitation_value": "Probabilidad de Precipitación (%)",
+    "storm_probability": "Probabilidad de Tormenta (%)",
+    "temperature_value": "Temperatura (°C)",
+    "temperature_min": "Temperatura Mínima (°C)",
+    "temperature_max": "Temperatura Máxima (°C)",
+    "wind_speed": "Velocidad del Viento (km/h)",
+}
+
+# Horas que cubre cada fila según su resolución
+HORAS_RESOLUCION = {resolucion: int(duracion / np.timedelta64(1, "h")) for resolucion, duracion in DURACIONES.items()}
+
+
+def ruta_malla(data_dir=None):
+    """Devuelve la ruta del fichero con la malla (municipio × hora) de la vista regional."""
+    return os.path.join(data_dir or DATA_DIR, "processed", "region.npz")
+
+
+def construir_malla(weather_df):
+    """
+    Construye a partir del DataFrame semanal de todos los municipios (con la columna `municipio`) una
+    matriz (municipio × hora) por variable. Cada fila de la predicción ocupa todas las horas de su
+    periodo (1, 6 o 24), así que cualquier hora tiene el valor del periodo que la contiene.
+    """
+    municipios, fila_municipio = np.unique(weather_df["municipio"].to_numpy(dtype=str), return_inverse=True)
+    inicio = weather_df["fecha_hora"].to_numpy(dtype="datetime64[h]")
+    horas_fila = weather_df["resolution"].map(HORAS_RESOLUCION).to_numpy(dtype=np.int64)
+    primera = inicio.min()
+    horas = np.arange(primera, (inicio + horas_fila).max(), dtype="datetime64[h]")
+
+    # Cada fila repetida en cada una de sus horas: (fila, columna de la hora en la malla)
+    filas = np.repeat(np.arange(len(weather_df)), horas_fila)
+    desplazamiento = np.arange(len(filas)) - np.repeat(np.cumsum(horas_fila) - horas_fila, horas_fila)
+    columnas = (inicio - primera).astype(np.int64)[filas] + desplazamiento
+
+    malla = {"municipios": municipios, "horas": horas.astype("datetime64[s]")}
+    for variable in VARIABLES_REGION:
+        valores = weather_df[variable].to_numpy(dtype=np.float32, na_value=np.nan)
+        matriz = np.full((len(municipios), len(horas)), np.nan, dtype=np.float32)
+        matriz[fila_municipio[filas], columnas] = valores[filas]
+        malla[variable] = matriz
+    return malla
+
+
+def publicar_malla(malla, data_dir=None):
+    """Guarda la malla en un fichero .npz y lo sustituye de forma atómica."""
+    buffer = io.BytesIO()
+    np.savez(buffer, **malla)
+    escribir_atomico(ruta_malla(data_dir), buffer.getvalue())
+
+
+class MallaRegional:
+    """Malla (municipio × hora) ya cargada, con los cortes por hora que dibuja la vista regional."""
+
+    def __init__(self, malla, version=None):
+        self.version = version
+        self.municipios = malla["municipios"]
+        self.horas = pd.DatetimeIndex(malla["horas"])
+        self.valores = {variable: malla[variable] for variable in VARIABLES_REGION}
+        nombres = nombres_municipios()
+        self.nombres = np.array([nombres.get(codigo, codigo) for codigo in self.municipios], dtype=object)
+
+    def posicion(self, hora):
+        """Columna de la hora que contiene `hora` (la primera o la última si queda fuera de la malla)."""
+        posicion = int(self.horas.searchsorted(pd.Timestamp(hora).floor("h"), side="right")) - 1
+        return min(max(posicion, 0), len(self.horas) - 1)
+
+    def corte(self, hora):
+        """DataFrame con el valor de cada variable en todos los municipios a la hora indicada."""
+        posicion = self.posicion(hora)
+        corte_df = pd.DataFrame({"municipio": self.nombres, **{variable: matriz[:, posicion] for variable, matriz in self.valores.items()}},
+                                index=pd.Index(self.municipios, name="codigo"))
+        corte_df["temperature_range"] = corte_df["temperature_max"] - corte_df["temperature_min"]
+        return corte_df
+
+
+# Malla ya leída de disco: ruta -> ((inodo, mtime), MallaRegional)
+_mallas = {}
+_mallas_lock = threading.Lock()
+
+
+def cargar_malla(data_dir=None):
+    """Devuelve la MallaRegional publicada (solo se vuelve a leer si el fichero ha cambiado), o None."""
+    ruta = ruta_malla(data_dir)
+    try:
+        stat = os.stat(ruta)
+    except FileNotFoundError:
+        return None
+    version = (stat.st_ino, stat.st_mtime_ns)
+    with _mallas_lock:
+        leida = _mallas.get(ruta)
+        if leida is None or leida[0] != version:
+            with np.load(ruta) as malla:
+                leida = _mallas[ruta] = (version, MallaRegional(malla, ("region", stat.st_mtime_ns)))
+        return leida[1]
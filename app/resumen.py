@@ -0,0 +1,55 @@
+import pandas as pd
+
+# Columnas del resumen diario: (columna del resumen, columna del DataFrame semanal, agregación)
+AGREGACIONES = [
+    ("temperature_min", "temperature_min", "min"),
+    ("temperature_max", "temperature_max", "max"),
+    ("precipitation_max", "precipitation_value", "max"),
+    ("storm_max", "storm_probability", "max"),
+    ("wind_max", "wind_speed", "max"),
+    ("sky_severity", "sky_severity", "max"),
+]
+
+# Hora en la que se alcanza cada máximo: (columna del resumen, columna del DataFrame semanal)
+HORAS_MAXIMO = [
+    ("precipitation_hora", "precipitation_value"),
+    ("storm_hora", "storm_probability"),
+]
+
+
+def resumen_diario(weather_df):
+    """
+    Calcula el resumen de cada día de la predicción: temperaturas mínima y máxima, máximas
+    probabilidades de lluvia y tormenta con la hora en que se alcanzan, viento máximo y el
+    estado del cielo más severo. Con un DataFrame de varios municipios (índice con `municipio`)
+    el resumen queda indexado por (municipio, fecha); con uno solo, por `fecha`.
+    """
+    claves = ["fecha"]
+    if "municipio" in weather_df.index.names:
+        claves, weather_df = ["municipio", "fecha"], weather_df.reset_index()
+    grupos = weather_df.groupby(claves, observed=True, sort=True)
+    resumen_df = grupos.agg(**{columna: (origen, agregacion) for columna, origen, agregacion in AGREGACIONES})
+
+    # Primera fila de cada día que alcanza el máximo (la hora de inicio, como con idxmax)
+    maximos = grupos[["precipitation_value", "storm_probability", "sky_severity"]].transform("max")
+    for columna, origen in HORAS_MAXIMO:
+        en_maximo = (weather_df[origen] == maximos[origen]).fillna(False).to_numpy()
+        resumen_df[columna] = weather_df[en_maximo].groupby(claves, observed=True)["fecha_hora"].first()
+    en_maximo = (weather_df["sky_severity"] == maximos["sky_severity"]).fillna(False).to_numpy()
+    peor_cielo = weather_df[en_maximo].groupby(claves, observed=True)
+    resumen_df["sky_value"] = peor_cielo["sky_value"].first()
+    resumen_df["sky_description"] = peor_cielo["sky_description"].first()
+
+    if claves == ["fecha"]:
+        # Igual que en el DataFrame semanal: la fecha como columna y como índice
+        resumen_df["fecha"] = resumen_df.index
+        resumen_df.index = pd.DatetimeIndex(resumen_df["fecha"]).rename(None)
+    return resumen_df
+
+
+def resumen_dia(resumen_df, fecha):
+    """Devuelve la fila del resumen de un día (date, datetime o Timestamp), o None si no está."""
+    fecha = pd.Timestamp(fecha).normalize()
+    if fecha not in resumen_df.index:
+        return None
+    return resumen_df.loc[fecha]
@@ -0,0 +1,204 @@
+import os, json, tempfile, threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Directorio local donde se guardan las predicciones descargadas y procesadas
+DATA_DIR = os.getenv("PLOUTERRETA_DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"))
+
+
+def _leer_umask():
+    """
+    Umask del proceso, leída de /proc sin cambiarla (os.umask solo se puede leer cambiándola, y
+    mientras tanto otros hilos crearían ficheros con otros permisos). Fuera de Linux, la habitual 022.
+    """
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for linea in f:
+                if linea.startswith("Umask:"):
+                    return int(linea.split()[1], 8)
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0o022
+
+
+# Permisos de los ficheros publicados (0o666 menos la umask, como un open() normal): mkstemp los crea con 0o600
+PERMISOS_FICHERO = 0o666 & ~_leer_umask()
+
+
+def ruta_prediccion(codigo_municipio, producto="horaria", data_dir=None):
+    """Devuelve la ruta del JSON con la predicción en bruto de un municipio."""
+    return os.path.join(data_dir or DATA_DIR, "raw", producto, f"{codigo_municipio}.json")
+
+
+def escribir_atomico(ruta, contenido, modo="wb"):
+    """Escribe un fichero en un temporal y lo renombra, para que nadie lea un fichero a medias."""
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(ruta), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, modo) as f:  # Cierra el descriptor aunque falle algo a continuación
+            # Que los lean también la app y la API aunque corran con otro usuario que refresher.py
+            os.fchmod(f.fileno(), PERMISOS_FICHERO)
+            f.write(contenido)
+        os.replace(tmp, ruta)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def guardar_prediccion(codigo_municipio, data, producto="horaria", data_dir=None):
+    """Guarda en disco la predicción en bruto de un municipio."""
+    ruta = ruta_prediccion(codigo_municipio, producto, data_dir)
+    escribir_atomico(ruta, json.dumps(data, ensure_ascii=False).encode("utf-8"))
+    return ruta
+
+
+def cargar_prediccion(codigo_municipio, producto="horaria", data_dir=None):
+    """Carga la predicción en bruto guardada de un municipio, o None si no existe."""
+    ruta = ruta_prediccion(codigo_municipio, producto, data_dir)
+    if not os.path.exists(ruta):
+        return None
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+# Columna de fecha que se usa como índice de los DataFrames de cada producto publicado
+INDICES = {"semanal": "fecha_hora", "resumen": "fecha"}
+
+
+def ruta_snapshot(producto="semanal", data_dir=None):
+    """Devuelve la ruta del fichero Arrow con los DataFrames procesados de todos los municipios."""
+    return os.path.join(data_dir or DATA_DIR, "processed", f"{producto}.arrow")
+
+
+def ruta_manifest(data_dir=None):
+    """Devuelve la ruta del manifiesto con la versión publicada de cada municipio."""
+    return os.path.join(data_dir or DATA_DIR, "processed", "manifest.json")
+
+
+def _tabla_frames(frames):
+    """
+    Convierte {codigo: weather_df}, o un DataFrame de varios municipios con índice (municipio, fecha),
+    en tablas Arrow con la columna `municipio`.
+    """
+    if isinstance(frames, pd.DataFrame):
+        weather_df = frames.reset_index()
+        weather_df["municipio"] = weather_df["municipio"].astype(str)
+        return [pa.Table.from_pandas(weather_df[["municipio", *frames.columns, *frames.index.names[1:]]], preserve_index=False)]
+    tablas = []
+    for codigo_municipio, weather_df in frames.items():
+        tabla = pa.Table.from_pandas(weather_df, preserve_index=False)
+        tablas.append(tabla.add_column(0, "municipio", pa.array([codigo_municipio] * len(tabla), pa.string())))
+    return tablas
+
+
+def publicar_frames(frames, producto="semanal", data_dir=None):
+    """
+    Publica los DataFrames procesados ({codigo: weather_df} o uno de varios municipios con índice
+    (municipio, fecha_hora o fecha)) en el fichero Arrow del producto, conservando los municipios que no
+    cambian. Se escribe un fichero nuevo y se sustituye de forma atómica: las sesiones que ya lo
+    tienen mapeado siguen leyendo el anterior.
+    """
+    ruta = ruta_snapshot(producto, data_dir)
+    tablas = _tabla_frames(frames)
+    anterior = _leer_snapshot(ruta)
+    if anterior is not None:
+        tabla = anterior[1]
+        publicados = frames.index.unique("municipio") if isinstance(frames, pd.DataFrame) else list(frames)
+        tablas.append(tabla.filter(pc.invert(pc.is_in(tabla["municipio"], pa.array(list(publicados), pa.string())))))
+    tablas = [tabla.replace_schema_metadata(tablas[0].schema.metadata) for tabla in tablas]
+    tabla = pa.concat_tables(tablas, promote_options="permissive").sort_by("municipio").unify_dictionaries()
+
+    # Posición de las filas de cada municipio, para recortarlas sin recorrer la tabla
+    municipios = tabla["municipio"].to_numpy()
+    codigos, inicios, filas = np.unique(municipios, return_index=True, return_counts=True)
+    posiciones = {codigo: [int(inicio), int(n)] for codigo, inicio, n in zip(codigos, inicios, filas)}
+    metadata = {**(tabla.schema.metadata or {}), b"plouterreta": json.dumps(posiciones).encode("utf-8")}
+    tabla = tabla.replace_schema_metadata(metadata).combine_chunks()
+
+    # Sin compresión, para que los lectores puedan mapear el fichero sin copiarlo
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, tabla.schema) as writer:
+        writer.write_table(tabla)
+    escribir_atomico(ruta, sink.getvalue())
+    return ruta
+
+
+# Ficheros Arrow ya mapeados: ruta -> ((inodo, mtime), tabla, posiciones)
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+
+def _leer_snapshot(ruta):
+    """Mapea en memoria el fichero Arrow (solo si ha cambiado desde la última vez) y devuelve (posiciones, tabla)."""
+    try:
+        stat = os.stat(ruta)
+    except FileNotFoundError:
+        return None
+    version = (stat.st_ino, stat.st_mtime_ns)
+    with _snapshots_lock:
+        leido = _snapshots.get(ruta)
+        if leido is None or leido[0] != version:
+            # Las columnas de la tabla apuntan al mapa de memoria: no se copian al leer
+            tabla = pa.ipc.open_file(pa.memory_map(ruta, "r")).read_all()
+            posiciones = json.loads(tabla.schema.metadata[b"plouterreta"])
+            leido = _snapshots[ruta] = (version, posiciones, tabla)
+        return leido[1:]
+
+
+def cargar_frame(codigo_municipio, producto="semanal", data_dir=None):
+    """Devuelve el DataFrame publicado de un municipio, o None si no está en el fichero Arrow."""
+    leido = _leer_snapshot(ruta_snapshot(producto, data_dir))
+    if leido is None or codigo_municipio not in leido[0]:
+        return None
+    posiciones, tabla = leido
+    # El recorte es una vista del fichero mapeado; solo se convierten a pandas las filas del municipio
+    weather_df = tabla.slice(*posiciones[codigo_municipio]).drop_columns("municipio").to_pandas()
+    indice = INDICES.get(producto, "fecha_hora")
+    weather_df.index = pd.DatetimeIndex(weather_df[indice]).rename(None)
+    return weather_df
+
+
+def cargar_frames(producto="semanal", data_dir=None):
+    """Devuelve todos los municipios publicados en un único DataFrame (con la columna `municipio`), o None."""
+    leido = _leer_snapshot(ruta_snapshot(producto, data_dir))
+    return None if leido is None else leido[1].to_pandas()
+
+
+def cargar_manifest(data_dir=None):
+    """Carga el manifiesto de versiones publicadas ({producto: {codigo: {...}}})."""
+    ruta = ruta_manifest(data_dir)
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+# Manifiesto ya leído de disco: ruta -> (mtime, manifest)
+_manifests_leidos = {}
+
+
+def cargar_version(codigo_municipio, producto="semanal", data_dir=None):
+    """
+    Devuelve la versión publicada de un municipio, (codigo, elaborado horaria, elaborado diaria),
+    o None si no está en el manifiesto. El manifiesto solo se vuelve a leer si ha cambiado.
+    """
+    ruta = ruta_manifest(data_dir)
+    try:
+        mtime = os.stat(ruta).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    leido = _manifests_leidos.get(ruta)
+    if leido is None or leido[0] != mtime:
+        leido = _manifests_leidos[ruta] = (mtime, cargar_manifest(data_dir))
+    publicado = leido[1].get(producto, {}).get(codigo_municipio)
+    if publicado is None:
+        return None
+    return (codigo_municipio, publicado.get("horaria"), publicado.get("diaria"))
+
+
+def guardar_manifest(manifest, data_dir=None):
+    """Guarda el manifiesto de versiones publicadas."""
+    escribir_atomico(ruta_manifest(data_dir), json.dumps(manifest, ensure_ascii=False, indent=1).encode("utf-8"))
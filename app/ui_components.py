@@ -1,192 +1,265 @@
 import streamlit as st
 from datetime import datetime, timedelta
-from .visualization import plot_temperature, plot_rain_chance, plot_weather_conditions, plot_wind_data, plot_storm_chance
+from .alertas import alertas_activas, texto_alerta
+from .forecast_view import ForecastView
+from .resumen import resumen_dia, resumen_diario
+from .visualization import plot_temperature, plot_rain_chance, plot_weather_conditions, plot_wind_data, plot_storm_chance, plot_combined, plot_region
+from .region import VARIABLES_REGION
 import pandas as pd
 
 def get_closest_data(df, column):
     """Encuentra el valor más cercano a la fecha actual en la columna especificada."""
-    current_time = datetime.now()
-    # Calcula la diferencia absoluta entre cada fecha y la fecha actual
-    df['time_difference'] = abs(df['fecha_hora'] - current_time)
-    # Encuentra el índice con la diferencia mínima
-    closest_index = df['time_difference'].idxmin()
-    return df.loc[closest_index, column]
-
-def get_today_precipitation_data(weather_df):
+    return ForecastView(df).get(column)
+
+def formato_valor(valor, unidad=""):
+    """Texto de una métrica con su unidad; los valores que faltan en la predicción se muestran como "—"."""
+    return "—" if pd.isna(valor) else f"{valor}{unidad}"
+
+def get_today_precipitation_data(resumen_df):
     """Obtiene la precipitación máxima del día actual."""
-    today = datetime.now().date()
-    today_data = weather_df[weather_df['fecha_hora'].dt.date == today]
-    today_data.loc[:,'precipitation_value'] = pd.to_numeric(today_data['precipitation_value'], errors='coerce')
-
-    if not today_data.empty:
-        lluvia_max = today_data['precipitation_value'].max()
-        if lluvia_max > 0:
-            lluvia_max_time = today_data.loc[today_data['precipitation_value'].idxmax(), 'fecha_hora'].strftime("%H:%M")
-            return lluvia_max, lluvia_max_time
+    today_data = resumen_dia(resumen_df, datetime.now())
+
+    if today_data is not None:
+        lluvia_max = today_data['precipitation_max']
+        if pd.notna(lluvia_max) and lluvia_max > 0:
+            return lluvia_max, today_data['precipitation_hora'].strftime("%H:%M")
     return 0, None
 
-def get_today_storm_data(weather_df):
+def get_today_storm_data(resumen_df):
     """Obtiene la probabilidad de tormenta y la hora de inicio de la tormenta del día actual."""
-    today = datetime.now().date()
-    today_data = weather_df[weather_df['fecha_hora'].dt.date == today]
-    today_data.loc[:,'storm_probability'] = pd.to_numeric(today_data['storm_probability'], errors='coerce')  # Suponiendo que hay una columna 'storm_chance'
-
-    if not today_data.empty:
-        tormenta_max = today_data['storm_probability'].max()
-        if tormenta_max > 0:
-            tormenta_max_time = today_data.loc[today_data['storm_probability'].idxmax(), 'fecha_hora'].strftime("%H:%M")
-            return tormenta_max, tormenta_max_time
+    today_data = resumen_dia(resumen_df, datetime.now())
+
+    if today_data is not None:
+        tormenta_max = today_data['storm_max']
+        if pd.notna(tormenta_max) and tormenta_max > 0:
+            return tormenta_max, today_data['storm_hora'].strftime("%H:%M")
     return 0, None
 
 
-def get_next_day_data(weather_df):
+def get_next_day_data(resumen_df):
     """Obtiene los datos del día siguiente."""
-    next_day = datetime.now() + timedelta(days=1)
-    next_day_data = weather_df[weather_df['fecha_hora'].dt.date == next_day.date()]
-    next_day_data.loc[:,'precipitation_value'] = pd.to_numeric(next_day_data['precipitation_value'], errors='coerce')
-    next_day_data.loc[:, 'storm_probability'] = pd.to_numeric(next_day_data['storm_probability'], errors='coerce')
-
-    if not next_day_data.empty:
-        temp_max_next = next_day_data['temperature_max'].max()
-        temp_min_next = next_day_data['temperature_min'].min()
-        lluvia_max_next = next_day_data['precipitation_value'].max()
-        lluvia_max_time = next_day_data.loc[next_day_data['precipitation_value'].idxmax(), 'fecha_hora'].strftime("%H:%M")
-        viento_max_next = next_day_data['wind_speed'].max()
-        condicion_max_sky_value = next_day_data.loc[next_day_data['sky_value'].idxmax(), 'sky_description']
-        tormenta_max_next = next_day_data['storm_probability'].max()
-        tormenta_max_time_next = next_day_data.loc[next_day_data['storm_probability'].idxmax(), 'fecha_hora'].strftime("%H:%M")
-
-        return temp_max_next, temp_min_next, lluvia_max_next, lluvia_max_time, condicion_max_sky_value, viento_max_next, tormenta_max_next, tormenta_max_time_next
-    return None, None, None, None, None, None
+    next_day_data = resumen_dia(resumen_df, datetime.now() + timedelta(days=1))
 
+    if next_day_data is not None:
+        lluvia_max_time = next_day_data['precipitation_hora']
+        tormenta_max_time = next_day_data['storm_hora']
+        return (
+            next_day_data['temperature_max'],
+            next_day_data['temperature_min'],
+            next_day_data['precipitation_max'],
+            lluvia_max_time.strftime("%H:%M") if pd.notna(lluvia_max_time) else None,
+            next_day_data['sky_description'],  # Condición más severa del día
+            next_day_data['wind_max'],
+            next_day_data['storm_max'],
+            tormenta_max_time.strftime("%H:%M") if pd.notna(tormenta_max_time) else None,
+        )
+    return None, None, None, None, None, None, None, None
 
 
-def show_weather_data(weather_df):
-    """Muestra los datos del clima organizados en la aplicación Streamlit."""
+def show_weather_data(weather_df, resumen_df=None, version=None):
+    """
+    Muestra los datos del clima organizados en la aplicación Streamlit. Con la versión de la
+    predicción, (municipio, elaborado...), los gráficos se reutilizan entre sesiones.
+    """
     if weather_df.empty:
         st.warning("No hay datos para mostrar.")
         return
 
-    # Crear pestañas para cada tipo de gráfico
-    tabs = st.tabs(["📊 Resumen", "🌡️ Temperatura", "💧 Lluvia y Tormenta", "☁️ Condiciones del Cielo", "🍃 Viento"])
-    
-    # Resumen (primera pestaña)
-    with tabs[0]:
-        col1, col2 = st.columns([2, 2])  # Ajustar el ancho de las columnas
-
-        with col1:
-            st.header("📝 Pronóstico para Hoy")
-
-            # Datos actuales
-            temp_actual = get_closest_data(weather_df, 'temperature_value')
-            temp_max = get_closest_data(weather_df, 'temperature_max')
-            temp_min = get_closest_data(weather_df, 'temperature_min')
-            lluvia_actual = get_closest_data(weather_df, 'precipitation_value')
-            viento_actual = get_closest_data(weather_df, 'wind_speed')  # Viento actual
-            condicion_actual = get_closest_data(weather_df, "sky_description")
-            tormenta_actual = get_closest_data(weather_df, "storm_probability")
-            lluvia_actual_max, lluvia_hora_inicio = get_today_precipitation_data(weather_df)
-            tormenta_actual_max, tormenta_hora_inicio = get_today_storm_data(weather_df)
-
-            # Mostrar información actual
-            st.metric("🌡️ Temperatura Actual", f"{temp_actual}°C")
-            st.metric("🔥 Temperatura Máxima", f"{temp_max}°C")
-            st.metric("❄️ Temperatura Mínima", f"{temp_min}°C")
-            st.metric("☔ Lluvia Actual", f"{lluvia_actual}%")
-            st.metric("⚡ Tormenta Actual", f"{tormenta_actual}%")
-            st.metric("🌀 Viento Actual", f"{viento_actual} km/h")
-            st.metric("🌞 Condición Actual", condicion_actual)
-            #st.metric("☔ Máxima Probabilidad de Lluvia", f"{lluvia_actual_max}%")
-            if lluvia_actual_max != 0:
-                st.metric("☔🕒 Inicio de Lluvia", lluvia_hora_inicio)
-            #st.metric("⚡ Máxima Probabilidad de Tormenta", f"{tormenta_actual_max}%")
-            if tormenta_actual_max != 0:
-                st.metric("⚡🕒 Inicio de Tormenta", tormenta_hora_inicio)
-            
-
-        with col2:
-            # Datos del día siguiente
-            temp_max_next, temp_min_next, lluvia_max_next, lluvia_hora_inicio, condicion_max_sky_value, viento_max_next, tormenta_max_next, tormenta_hora_inicio_next = get_next_day_data(weather_df)
-            if temp_max_next is not None:
-                st.header("📅 Pronóstico para Mañana")
-                
-                st.metric("🔥 Temperatura Máxima", f"{temp_max_next}°C")
-                st.metric("❄️ Temperatura Mínima", f"{temp_min_next}°C")
-                st.metric("🌀 Viento Máximo", f"{viento_max_next} km/h")
-                st.metric("🌞 Condición Máxima", condicion_max_sky_value)  # Condición del cielo con mayor sky_value
-                #st.metric("☔ Máxima Probabilidad de Lluvia", f"{lluvia_max_next}%")
-                if lluvia_max_next != 0:
-                    st.metric("☔🕒 Inicio de Lluvia", f"{lluvia_hora_inicio}")
-                #st.metric("⚡ Máxima Probabilidad de Tormenta", f"{tormenta_max_next}%")
-                if tormenta_max_next != 0:
-                    st.metric("⚡🕒 Inicio de Tormenta", f"{tormenta_hora_inicio_next}")
-                
-            else:
-                st.warning("No hay datos disponibles para el día siguiente.")
-
-    # Temperatura (segunda pestaña)
-    with tabs[1]:
-        st.subheader("Gráfico de Temperaturas")
-        col1, col2 = st.columns([3, 1])  # Ajustar el ancho de las columnas
-        
-        with col1:
-            plot_temperature(weather_df)
-        
-        # Buscar las temperaturas más cercanas a la fecha actual
-        temp_actual = get_closest_data(weather_df, 'temperature_value')
-        temp_max = get_closest_data(weather_df, 'temperature_max')
-        temp_min = get_closest_data(weather_df, 'temperature_min')
-
-        # Mostrar métricas con emoticonos
-        with col2:
-            st.metric("🌡️ Temperatura Actual", f"{temp_actual}°C")
-            st.metric("🔥 Temperatura Máxima", f"{temp_max}°C")
-            st.metric("❄️ Temperatura Mínima", f"{temp_min}°C")
-
-    # Probabilidad de Lluvia (tercera pestaña)
-    with tabs[2]:
-        col1, col2 = st.columns([3, 1])  # Ajustar el ancho de las columnas
-        
-        with col1:
-            st.subheader("Gráfico de Probabilidad de Precipitación")
-            plot_rain_chance(weather_df)
-            st.subheader("Gráfico de Probabilidad de Tormenta")
-            plot_storm_chance(weather_df)
-        
-        # Obtener el dato de lluvia y tormenta más cercano a la fecha actual
-        lluvia_actual = get_closest_data(weather_df, 'precipitation_value')
-        tormenta_actual = get_closest_data(weather_df, 'storm_probability')
-        
-        with col2:
-            st.metric("☔ Lluvia Actual", f"{lluvia_actual}%")
-            st.metric("⚡ Tormenta Actual", f"{tormenta_actual}%")
-
-    # Condiciones del Cielo (cuarta pestaña)
-    with tabs[3]:
-        st.subheader("Gráfico de Condiciones del Cielo")
-        
-        # Crear dos columnas
-        col1, col2 = st.columns([3, 1])  # Ajustar el ancho de las columnas
-        
-        # Columna 1: Gráfico de condiciones del cielo
-        with col1:
-            plot_weather_conditions(weather_df)
-        
-        # Columna 2: Datos actuales de condiciones del cielo
-        with col2:
-            condicion_actual = get_closest_data(weather_df, "sky_description")
-            st.metric("🌞 Condición Actual", condicion_actual)
-
-    # Velocidad del Viento (quinta pestaña)
-    with tabs[4]:
-        st.subheader("Gráfico de Velocidad del Viento")
-        col1, col2 = st.columns([3, 1])  # Ajustar el ancho de las columnas
-        
-        with col1:
-            plot_wind_data(weather_df)
-        
-        # Obtener el dato de velocidad de viento más cercano a la fecha actual
-        viento_actual = get_closest_data(weather_df, 'wind_speed')
-        
-        with col2:
-            st.metric("🌀 Viento Actual", f"{viento_actual} km/h")
+    # Resumen por días (publicado junto a la predicción; si no, se calcula aquí)
+    if resumen_df is None:
+        resumen_df = resumen_diario(weather_df)
+
+    # Alertas en vigor (mismas reglas que las que publica refresher.py)
+    for alerta in alertas_activas(weather_df).to_dict("records"):
+        st.warning(texto_alerta(alerta))
+
+    # La fila más cercana al momento actual se busca una sola vez para todas las pestañas
+    vista = ForecastView(weather_df)
+
+    # Solo se dibuja la pestaña elegida; al cambiar de pestaña se vuelve a ejecutar únicamente el fragmento
+    _show_pestana(weather_df, resumen_df, vista, version)
+
+
+@st.fragment
+def _show_pestana(weather_df, resumen_df, vista, version):
+    """Selector de pestaña y contenido de la pestaña seleccionada."""
+    pestana = st.segmented_control("Pestaña", list(PESTANAS), default=PESTANA_INICIAL, key="pestana",
+                                   label_visibility="collapsed")
+    PESTANAS[pestana or PESTANA_INICIAL](weather_df, resumen_df, vista, version)
+
+
+def _show_resumen(weather_df, resumen_df, vista, version):
+    """Pestaña de resumen: datos de hoy y de mañana."""
+    col1, col2 = st.columns([2, 2])  # Ajustar el ancho de las columnas
+
+    with col1:
+        st.header("📝 Pronóstico para Hoy")
+
+        # Datos actuales
+        temp_actual = vista.get('temperature_value')
+        temp_max = vista.get('temperature_max')
+        temp_min = vista.get('temperature_min')
+        lluvia_actual = vista.get('precipitation_value')
+        viento_actual = vista.get('wind_speed')  # Viento actual
+        condicion_actual = vista.get("sky_description")
+        tormenta_actual = vista.get("storm_probability")
+        lluvia_actual_max, lluvia_hora_inicio = get_today_precipitation_data(resumen_df)
+        tormenta_actual_max, tormenta_hora_inicio = get_today_storm_data(resumen_df)
+
+        # Mostrar información actual
+        st.metric("🌡️ Temperatura Actual", formato_valor(temp_actual, "°C"))
+        st.metric("🔥 Temperatura Máxima", formato_valor(temp_max, "°C"))
+        st.metric("❄️ Temperatura Mínima", formato_valor(temp_min, "°C"))
+        st.metric("☔ Lluvia Actual", formato_valor(lluvia_actual, "%"))
+        st.metric("⚡ Tormenta Actual", formato_valor(tormenta_actual, "%"))
+        st.metric("🌀 Viento Actual", formato_valor(viento_actual, " km/h"))
+        st.metric("🌞 Condición Actual", formato_valor(condicion_actual))
+        #st.metric("☔ Máxima Probabilidad de Lluvia", f"{lluvia_actual_max}%")
+        if lluvia_actual_max != 0:
+            st.metric("☔🕒 Inicio de Lluvia", lluvia_hora_inicio)
+        #st.metric("⚡ Máxima Probabilidad de Tormenta", f"{tormenta_actual_max}%")
+        if tormenta_actual_max != 0:
+            st.metric("⚡🕒 Inicio de Tormenta", tormenta_hora_inicio)
+
+    with col2:
+        # Datos del día siguiente
+        temp_max_next, temp_min_next, lluvia_max_next, lluvia_hora_inicio, condicion_max_sky_value, viento_max_next, tormenta_max_next, tormenta_hora_inicio_next = get_next_day_data(resumen_df)
+        if temp_max_next is not None:
+            st.header("📅 Pronóstico para Mañana")
+
+            st.metric("🔥 Temperatura Máxima", formato_valor(temp_max_next, "°C"))
+            st.metric("❄️ Temperatura Mínima", formato_valor(temp_min_next, "°C"))
+            st.metric("🌀 Viento Máximo", formato_valor(viento_max_next, " km/h"))
+            st.metric("🌞 Condición Máxima", formato_valor(condicion_max_sky_value))  # Condición del cielo con mayor sky_value
+            #st.metric("☔ Máxima Probabilidad de Lluvia", f"{lluvia_max_next}%")
+            if pd.notna(lluvia_max_next) and lluvia_max_next != 0:
+                st.metric("☔🕒 Inicio de Lluvia", f"{lluvia_hora_inicio}")
+            #st.metric("⚡ Máxima Probabilidad de Tormenta", f"{tormenta_max_next}%")
+            if pd.notna(tormenta_max_next) and tormenta_max_next != 0:
+                st.metric("⚡🕒 Inicio de Tormenta", f"{tormenta_hora_inicio_next}")
+
+        else:
+            st.warning("No hay datos disponibles para el día siguiente.")
+
+
+def _show_temperatura(weather_df, resumen_df, vista, version):
+    """Pestaña de temperatura."""
+    st.subheader("Gráfico de Temperaturas")
+    col1, col2 = st.columns([3, 1])  # Ajustar el ancho de las columnas
+
+    with col1:
+        plot_temperature(weather_df, version)
+
+    # Buscar las temperaturas más cercanas a la fecha actual
+    temp_actual = vista.get('temperature_value')
+    temp_max = vista.get('temperature_max')
+    temp_min = vista.get('temperature_min')
+
+    # Mostrar métricas con emoticonos
+    with col2:
+        st.metric("🌡️ Temperatura Actual", formato_valor(temp_actual, "°C"))
+        st.metric("🔥 Temperatura Máxima", formato_valor(temp_max, "°C"))
+        st.metric("❄️ Temperatura Mínima", formato_valor(temp_min, "°C"))
+
+
+def _show_lluvia(weather_df, resumen_df, vista, version):
+    """Pestaña de probabilidad de lluvia y tormenta."""
+    col1, col2 = st.columns([3, 1])  # Ajustar el ancho de las columnas
+
+    with col1:
+        st.subheader("Gráfico de Probabilidad de Precipitación")
+        plot_rain_chance(weather_df, version)
+        st.subheader("Gráfico de Probabilidad de Tormenta")
+        plot_storm_chance(weather_df, version)
+
+    # Obtener el dato de lluvia y tormenta más cercano a la fecha actual
+    lluvia_actual = vista.get('precipitation_value')
+    tormenta_actual = vista.get('storm_probability')
+
+    with col2:
+        st.metric("☔ Lluvia Actual", formato_valor(lluvia_actual, "%"))
+        st.metric("⚡ Tormenta Actual", formato_valor(tormenta_actual, "%"))
+
+
+def _show_cielo(weather_df, resumen_df, vista, version):
+    """Pestaña de condiciones del cielo."""
+    st.subheader("Gráfico de Condiciones del Cielo")
+
+    # Crear dos columnas
+    col1, col2 = st.columns([3, 1])  # Ajustar el ancho de las columnas
+
+    # Columna 1: Gráfico de condiciones del cielo
+    with col1:
+        plot_weather_conditions(weather_df, version)
+
+    # Columna 2: Datos actuales de condiciones del cielo
+    with col2:
+        condicion_actual = vista.get("sky_description")
+        st.metric("🌞 Condición Actual", formato_valor(condicion_actual))
+
+
+def _show_viento(weather_df, resumen_df, vista, version):
+    """Pestaña de velocidad del viento."""
+    st.subheader("Gráfico de Velocidad del Viento")
+    col1, col2 = st.columns([3, 1])  # Ajustar el ancho de las columnas
+
+    with col1:
+        plot_wind_data(weather_df, version)
+
+    # Obtener el dato de velocidad de viento más cercano a la fecha actual
+    viento_actual = vista.get('wind_speed')
+
+    with col2:
+        st.metric("🌀 Viento Actual", formato_valor(viento_actual, " km/h"))
+
+
+def _show_todo(weather_df, resumen_df, vista, version):
+    """Pestaña con todos los gráficos en una figura con el eje de fechas compartido."""
+    st.subheader("Todos los Gráficos")
+    plot_combined(weather_df, version)
+
+
+# Pestañas de show_weather_data: título -> función que dibuja su contenido
+PESTANAS = {
+    "📊 Resumen": _show_resumen,
+    "🌡️ Temperatura": _show_temperatura,
+    "💧 Lluvia y Tormenta": _show_lluvia,
+    "☁️ Condiciones del Cielo": _show_cielo,
+    "🍃 Viento": _show_viento,
+    "🗂️ Todo": _show_todo,
+}
+PESTANA_INICIAL = "📊 Resumen"
+
+
+def show_region(malla):
+    """
+    Vista regional: mapa de calor de una variable en todos los municipios y tabla con todas las
+    variables a la hora elegida. Todo sale de la malla (municipio × hora) precalculada por refresher.py.
+    """
+    variable = st.selectbox("Variable", list(VARIABLES_REGION), format_func=VARIABLES_REGION.get)
+    plot_region(malla, variable, VARIABLES_REGION[variable])
+    _show_hora_region(malla, variable)
+
+
+@st.fragment
+def _show_hora_region(malla, variable):
+    """Selector de hora y tabla de la región; al moverlo solo se vuelve a ejecutar este fragmento."""
+    horas = list(malla.horas)
+    hora = st.select_slider("Hora", horas, value=horas[malla.posicion(datetime.now())],
+                            format_func=lambda h: h.strftime("%a %d/%m %H:%M"))
+    corte_df = malla.corte(hora).sort_values(variable, ascending=False)
+    porcentaje = dict(min_value=0, max_value=100, format="%d %%")
+    st.dataframe(
+        corte_df,
+        column_config={
+            "municipio": "Municipio",
+            "precipitation_value": st.column_config.ProgressColumn("💧 Lluvia", **porcentaje),
+            "storm_probability": st.column_config.ProgressColumn("⛈️ Tormenta", **porcentaje),
+            "temperature_value": st.column_config.NumberColumn("🌡️ Temp.", format="%d °C"),
+            "temperature_min": st.column_config.NumberColumn("Mín.", format="%d °C"),
+            "temperature_max": st.column_config.NumberColumn("Máx.", format="%d °C"),
+            "wind_speed": st.column_config.NumberColumn("🍃 Viento", format="%d km/h"),
+            "temperature_range": st.column_config.NumberColumn("Rango", format="%d °C"),
+        },
+        hide_index=True,
+    )
@@ -0,0 +1,92 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class VersionCache:
+    """
+    Caché en memoria por (versión de la predicción, tipo), compartida por todas las sesiones del proceso.
+
+    La versión es (municipio, elaborado...) con los `elaborado` de AEMET de los datos, así que una
+    entrada solo deja de servirse cuando llega una predicción nueva: entonces se descartan las
+    entradas de la versión anterior del municipio. Además se expulsan las entradas usadas hace más
+    tiempo cuando el tamaño total (medido con `tamano`) supera `max_bytes`.
+
+    Si varias sesiones piden a la vez una entrada que no está, solo la primera la construye y las
+    demás esperan su resultado.
+    """
+
+    def __init__(self, max_bytes, tamano=len):
+        self.max_bytes = max_bytes
+        self.tamano = tamano
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entradas = OrderedDict()  # (versión, tipo) -> (valor, tamaño)
+        self._versiones = {}  # municipio -> última versión guardada
+        self._en_vuelo = {}  # (versión, tipo) -> Future de la construcción en curso
+        self._lock = threading.Lock()
+
+    def get(self, version, tipo, build):
+        """Devuelve el valor de (version, tipo); si no está en memoria, lo construye con `build()`."""
+        clave = (version, tipo)
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                self._entradas.move_to_end(clave)
+                self.hits += 1
+                return entrada[0]
+            futuro = self._en_vuelo.get(clave)
+            if futuro is not None:
+                # Otra sesión ya lo está construyendo: esperar a su resultado
+                self.hits += 1
+                esperar = True
+            else:
+                futuro = self._en_vuelo[clave] = Future()
+                self.misses += 1
+                esperar = False
+        if esperar:
+            return futuro.result()
+
+        try:
+            valor = build()
+            self._guardar(clave, valor)
+        except BaseException as error:
+            # Sin guardar nada: la próxima petición lo vuelve a intentar
+            with self._lock:
+                self._en_vuelo.pop(clave, None)
+            futuro.set_exception(error)
+            raise
+        futuro.set_result(valor)
+        return valor
+
+    def _guardar(self, clave, valor):
+        version, tamano = clave[0], self.tamano(valor)
+        with self._lock:
+            self._en_vuelo.pop(clave, None)
+            # Una predicción nueva del municipio deja obsoletas las entradas de la anterior
+            anterior = self._versiones.get(version[0])
+            if anterior is not None and anterior != version:
+                self._descartar(anterior)
+            self._versiones[version[0]] = version
+            if clave in self._entradas:
+                self.bytes -= self._entradas.pop(clave)[1]
+            self._entradas[clave] = (valor, tamano)
+            self.bytes += tamano
+            while self.bytes > self.max_bytes and len(self._entradas) > 1:
+                self.bytes -= self._entradas.popitem(last=False)[1][1]
+
+    def _descartar(self, version=None):
+        for clave in list(self._entradas):
+            if version is None or clave[0] == version:
+                self.bytes -= self._entradas.pop(clave)[1]
+
+    def invalidate(self, version=None):
+        """Elimina las entradas de una versión (todas si no se indica)."""
+        with self._lock:
+            self._descartar(version)
+
+    def estadisticas(self):
+        """Aciertos, fallos, número de entradas y bytes ocupados."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entradas": len(self._entradas), "bytes": self.bytes}
@@ -1,162 +1,222 @@
-import plotly.express as px
+import numpy as np
 import plotly.graph_objects as go
 import streamlit as st
+from plotly.subplots import make_subplots
 
-def plot_temperature(data):
-    """Genera un gráfico de temperatura máxima, mínima y actual por fecha y hora."""
-    # Crear un gráfico de líneas para las temperaturas
-    fig = px.line(data, 
-                  x='fecha_hora', 
-                  y=['temperature_value', 'temperature_max', 'temperature_min'],
-                  #title='Temperaturas por Fecha y Hora',
-                  labels={'value': 'Temperatura (°C)', 'variable': 'Temp.'},
-                  markers=True)
-
-    # Cambiar las etiquetas de los tipos de temperatura
-    fig.for_each_trace(lambda t: t.update(name=t.name.replace('temperature_value', 'Actual')
-                                            .replace('temperature_max', 'Máxima')
-                                            .replace('temperature_min', 'Mínima')))
-    
-    fig.update_layout(yaxis_title='Temperatura (°C)', xaxis_title='Fecha y Hora')
-    st.plotly_chart(fig)  # Mostrar el gráfico en la aplicación Streamlit
+from .estado_cielo import DESCRIPCIONES_CIELO
+from .figure_cache import figure_cache
+
+# A partir de este número de puntos las líneas se dibujan con WebGL (Scattergl)
+UMBRAL_WEBGL = 1000
+
+# Niveles de probabilidad de lluvia con emoticonos correspondientes
+NIVELES_LLUVIA = {
+    0: "☀️",  # Soleado, sin lluvia
+    20: "🌤️",  # Baja probabilidad de lluvia
+    40: "🌦️",  # Probabilidad moderada de lluvia
+    60: "🌧️",  # Alta probabilidad de lluvia
+    80: "⛈️",  # Muy alta probabilidad de lluvia o tormenta
+    100: "⚡"   # Tormenta con truenos
+}
+
+# Niveles de probabilidad de tormenta con emoticonos correspondientes
+NIVELES_TORMENTA = {
+    0: "☀️",  # Soleado, sin tormenta
+    20: "🌤️",  # Baja probabilidad de tormenta
+    40: "⛈️",  # Probabilidad moderada de tormenta
+    60: "🌩️",  # Alta probabilidad de tormenta
+    80: "⚡",   # Muy alta probabilidad de tormenta
+    100: "🌪️"  # Tormenta severa
+}
+
+# Niveles de velocidad del viento con emoticonos correspondientes
+NIVELES_VIENTO = {
+    0: "🍃",    # Brisa suave
+    5: "🌬️",  # Viento moderado
+    10: "💨",   # Viento fuerte
+    15: "🌪️",  # Viento muy fuerte
+}
+
+# Nombres de las series de temperatura
+TEMPERATURAS = {"temperature_value": "Actual", "temperature_max": "Máxima", "temperature_min": "Mínima"}
+
+# Diseño común: sin la plantilla de Plotly (Streamlit aplica su propio tema) y eje de fechas
+DISENO = dict(template="none", xaxis=dict(type="date", title="Fecha y Hora"))
+
+
+def _eje_x(data):
+    """Fechas como milisegundos desde 1970: se envían como un array binario en lugar de textos ISO."""
+    return data["fecha_hora"].to_numpy(dtype="datetime64[ms]").astype(np.int64).astype(np.float64)
+
+
+def _valores(data, column):
+    """Columna como array de float (NaN en los huecos), que Plotly serializa en binario."""
+    return data[column].to_numpy(dtype=np.float32, na_value=np.nan)
+
+
+def _linea(data, x, column, name, **kwargs):
+    """Serie de líneas y marcadores; con muchos puntos se usa WebGL."""
+    Scatter = go.Scattergl if len(data) > UMBRAL_WEBGL else go.Scatter
+    return Scatter(x=x, y=_valores(data, column), name=name, mode="lines+markers", **kwargs)
 
-def plot_rain_chance(data):
-    """Genera un gráfico de probabilidad de precipitación por fecha y hora con anotaciones de emoticonos."""
-    # Crear el gráfico principal de líneas para la probabilidad de precipitación
-    fig = px.line(data,
-                  x='fecha_hora',
-                  y='precipitation_value',
-                  labels={'precipitation_value': 'Probabilidad (%)'},
-                  markers=True)
-
-    # Definir los niveles de probabilidad con emoticonos correspondientes
-    emoji_levels = {
-        0: "☀️",  # Soleado, sin lluvia
-        20: "🌤️",  # Baja probabilidad de lluvia
-        40: "🌦️",  # Probabilidad moderada de lluvia
-        60: "🌧️",  # Alta probabilidad de lluvia
-        80: "⛈️",  # Muy alta probabilidad de lluvia o tormenta
-        100: "⚡"   # Tormenta con truenos
-    }
-
-    # Añadir anotaciones con emoticonos según el nivel de probabilidad
-    for level, emoji in emoji_levels.items():
+
+def _emoticonos(fig, niveles, yref="y"):
+    """Añade los emoticonos de cada nivel al lado derecho del gráfico."""
+    for level, emoji in niveles.items():
         fig.add_annotation(
-            xref="paper", yref="y",
+            xref="paper", yref=yref,
             x=1.05, y=level,  # Ajustar posición de los emojis al lado derecho
             text=emoji,
             showarrow=False,
             font=dict(size=14)
         )
 
+
+def _barras_cielo(data, x, **kwargs):
+    """
+    Una única serie de barras para el estado del cielo, coloreada por su severidad; la barra de
+    color hace de leyenda con las descripciones presentes en los datos.
+    """
+    severidad = _valores(data, "sky_severity")
+    presentes = np.unique(severidad[~np.isnan(severidad)]).astype(int)
+    return go.Bar(
+        x=x, y=_valores(data, "sky_value"),
+        hovertext=data["sky_description"].astype(object).fillna("").to_numpy(),
+        hovertemplate="%{hovertext}<extra></extra>",
+        marker=dict(
+            color=severidad, colorscale="Turbo", cmin=1, cmax=len(DESCRIPCIONES_CIELO),
+            colorbar=dict(tickvals=presentes, ticktext=[DESCRIPCIONES_CIELO[i - 1] for i in presentes], **kwargs),
+        ),
+        name="Cielo", showlegend=False,
+    )
+
+
+def build_temperature(data):
+    """Construye el gráfico de temperatura máxima, mínima y actual por fecha y hora."""
+    x = _eje_x(data)
+    fig = go.Figure([_linea(data, x, column, name) for column, name in TEMPERATURAS.items()])
+    fig.update_layout(DISENO, yaxis_title='Temperatura (°C)', legend_title_text='Temp.')
+    return fig
+
+def build_rain_chance(data):
+    """Construye el gráfico de probabilidad de precipitación por fecha y hora con anotaciones de emoticonos."""
+    fig = go.Figure(_linea(data, _eje_x(data), "precipitation_value", "Lluvia"))
+    _emoticonos(fig, NIVELES_LLUVIA)
+
     # Configurar diseño del gráfico
     fig.update_layout(
+        DISENO,
         yaxis_title="Probabilidad de Precipitación (%)",
-        xaxis_title="Fecha y Hora",
         margin=dict(r=100)  # Espacio adicional para las anotaciones
     )
+    return fig
 
-    # Mostrar el gráfico en la aplicación Streamlit
-    st.plotly_chart(fig)
-
-
-def plot_storm_chance(data):
-    """Genera un gráfico de probabilidad de tormenta por fecha y hora con anotaciones de emoticonos."""
-    # Preparar los datos para el gráfico
-    fig = px.line(data,
-                  x='fecha_hora',
-                  y='storm_probability',
-                  labels={'precipitation_value': 'Probabilidad (%)'},
-                  markers=True)
-
-    # Definir los niveles de probabilidad de tormenta con emoticonos correspondientes
-    emoji_levels = {
-        0: "☀️",  # Soleado, sin tormenta
-        20: "🌤️",  # Baja probabilidad de tormenta
-        40: "⛈️",  # Probabilidad moderada de tormenta
-        60: "🌩️",  # Alta probabilidad de tormenta
-        80: "⚡",   # Muy alta probabilidad de tormenta
-        100: "🌪️"  # Tormenta severa
-    }
-
-    # Añadir anotaciones con emoticonos según el nivel de probabilidad
-    for level, emoji in emoji_levels.items():
-        fig.add_annotation(
-            xref="paper", yref="y",
-            x=1.05, y=level,  # Ajustar posición de los emojis al lado derecho
-            text=emoji,
-            showarrow=False,
-            font=dict(size=14)
-        )
+
+def build_storm_chance(data):
+    """Construye el gráfico de probabilidad de tormenta por fecha y hora con anotaciones de emoticonos."""
+    fig = go.Figure(_linea(data, _eje_x(data), "storm_probability", "Tormenta"))
+    _emoticonos(fig, NIVELES_TORMENTA)
 
     # Configurar diseño del gráfico
     fig.update_layout(
+        DISENO,
         yaxis_title="Probabilidad de Tormenta (%)",
-        xaxis_title="Fecha y Hora",
         margin=dict(r=100)  # Espacio adicional para las anotaciones
     )
+    return fig
 
-    # Mostrar el gráfico en la aplicación Streamlit
-    st.plotly_chart(fig)
-
-
-def plot_weather_conditions(data):
-    """Genera un gráfico de condiciones del cielo por fecha y hora."""
-    # Crear una figura de Plotly
-    fig = go.Figure()
-
-    # Añadir las barras para cada descripción del cielo
-    for description in data['sky_description'].unique():
-        filtered_data = data[data['sky_description'] == description]
-        fig.add_trace(go.Bar(
-            x=filtered_data['fecha_hora'],
-            y=filtered_data['sky_value'],
-            name=description,
-        ))
-    
-    # Actualizar el diseño de la figura
-    fig.update_layout(
-        #title='Frecuencia de Condiciones del Cielo por Fecha y Hora',
-        xaxis_title='Fecha y Hora',
-        yaxis_title='Puntuación del Cielo',
-        barmode='group'  # Puedes cambiar a 'overlay' si deseas
-    )
 
-    st.plotly_chart(fig)  # Mostrar el gráfico en la aplicación Streamlit
+def build_weather_conditions(data):
+    """Construye el gráfico de condiciones del cielo por fecha y hora."""
+    fig = go.Figure(_barras_cielo(data, _eje_x(data)))
+    fig.update_layout(DISENO, yaxis_title='Puntuación del Cielo')
+    return fig
 
-def plot_wind_data(data):
-    """Genera un gráfico de velocidad del viento por fecha y hora con anotaciones de emoticonos."""
-    # Crear el gráfico principal de líneas para la velocidad del viento
-    fig = px.line(data,
-                  x='fecha_hora',
-                  y='wind_speed',
-                  labels={'wind_speed': 'Velocidad del Viento (km/h)'},
-                  markers=True)
-
-    # Definir los niveles de velocidad del viento con emoticonos correspondientes
-    emoji_levels = {
-        0: "🍃",    # Brisa suave
-        5: "🌬️",  # Viento moderado
-        10: "💨",   # Viento fuerte
-        15: "🌪️",  # Viento muy fuerte
-    }
-
-    # Añadir anotaciones con emoticonos según el nivel de velocidad del viento
-    for level, emoji in emoji_levels.items():
-        fig.add_annotation(
-            xref="paper", yref="y",
-            x=1.05, y=level,  # Posición al lado derecho del gráfico
-            text=emoji,
-            showarrow=False,
-            font=dict(size=14)
-        )
+def build_wind_data(data):
+    """Construye el gráfico de velocidad del viento por fecha y hora con anotaciones de emoticonos."""
+    fig = go.Figure(_linea(data, _eje_x(data), "wind_speed", "Viento"))
+    _emoticonos(fig, NIVELES_VIENTO)
 
     # Configuración del diseño del gráfico
     fig.update_layout(
+        DISENO,
         yaxis_title="Velocidad del Viento (km/h)",
-        xaxis_title="Fecha y Hora",
         margin=dict(r=100)  # Espacio adicional para las anotaciones
     )
+    return fig
+
+
+def build_combined(data):
+    """
+    Construye un único gráfico con paneles de temperatura, lluvia y tormenta, cielo y viento que
+    comparten el eje de fechas (al hacer zoom en uno se mueven todos).
+    """
+    x = _eje_x(data)
+    fig = make_subplots(rows=4, cols=1, shared_xaxes=True, vertical_spacing=0.04,
+                        subplot_titles=["Temperatura (°C)", "Lluvia y Tormenta (%)", "Cielo", "Viento (km/h)"])
+    for column, name in TEMPERATURAS.items():
+        fig.add_trace(_linea(data, x, column, name), row=1, col=1)
+    fig.add_trace(_linea(data, x, "precipitation_value", "Lluvia"), row=2, col=1)
+    fig.add_trace(_linea(data, x, "storm_probability", "Tormenta"), row=2, col=1)
+    fig.add_trace(_barras_cielo(data, x, len=0.22, y=0.37), row=3, col=1)
+    fig.add_trace(_linea(data, x, "wind_speed", "Viento"), row=4, col=1)
+    fig.update_layout(template="none", height=900)
+    fig.update_xaxes(type="date")
+    fig.update_xaxes(title_text="Fecha y Hora", row=4, col=1)
+    return fig
+
+
+def build_region(malla, variable, titulo):
+    """Construye el mapa de calor (municipio × hora) de una variable de la malla regional."""
+    fig = go.Figure(go.Heatmap(
+        x=malla.horas.to_numpy(dtype="datetime64[ms]").astype(np.int64).astype(np.float64),
+        y=malla.nombres, z=malla.valores[variable],
+        colorscale="Turbo", colorbar=dict(title=titulo),
+        hovertemplate="%{y}<br>%{x}<br>%{z}<extra></extra>",
+    ))
+    fig.update_layout(DISENO, yaxis=dict(showticklabels=False, title="Municipio"), height=600)
+    return fig
+
+
+def _mostrar(tipo, build, data, version=None):
+    """Muestra un gráfico; con la versión de la predicción, la figura sale de la caché compartida."""
+    if version is None:
+        fig = build(data)
+    else:
+        fig = figure_cache.get(version, tipo, lambda: build(data))
+    st.plotly_chart(fig)  # Mostrar el gráfico en la aplicación Streamlit
+
+
+def plot_temperature(data, version=None):
+    """Muestra el gráfico de temperaturas (desde la caché si se indica la versión de la predicción)."""
+    _mostrar("temperature", build_temperature, data, version)
+
+
+def plot_rain_chance(data, version=None):
+    """Muestra el gráfico de probabilidad de precipitación."""
+    _mostrar("rain_chance", build_rain_chance, data, version)
+
+
+def plot_storm_chance(data, version=None):
+    """Muestra el gráfico de probabilidad de tormenta."""
+    _mostrar("storm_chance", build_storm_chance, data, version)
+
+
+def plot_weather_conditions(data, version=None):
+    """Muestra el gráfico de condiciones del cielo."""
+    _mostrar("weather_conditions", build_weather_conditions, data, version)
+
+
+def plot_wind_data(data, version=None):
+    """Muestra el gráfico de velocidad del viento."""
+    _mostrar("wind_data", build_wind_data, data, version)
+
+
+def plot_combined(data, version=None):
+    """Muestra el gráfico combinado con todos los paneles."""
+    _mostrar("combined", build_combined, data, version)
+
 
-    # Mostrar el gráfico en la aplicación Streamlit
-    st.plotly_chart(fig)
+def plot_region(malla, variable, titulo):
+    """Muestra el mapa de calor regional de una variable (desde la caché, por versión de la malla)."""
+    _mostrar(f"region_{variable}", lambda m: build_region(m, variable, titulo), malla, malla.version)
@@ -1,8 +1,11 @@
 import streamlit as st
-from app.data_fetching import get_weather_data3, get_codigo_municipio
-from app.data_processing_hour import process_weather_data
+from app.data_fetching import get_codigo_municipio
+from app.cache import forecast_cache
+from app.figure_cache import figure_cache
+from app.frame_cache import cargar_prediccion, frame_cache
 from app.visualization import plot_temperature, plot_rain_chance, plot_weather_conditions, plot_wind_data
-from app.ui_components import show_weather_data
+from app.region import cargar_malla
+from app.ui_components import show_region, show_weather_data
 
 # Lista de municipios disponibles
 municipios = [
@@ -12,15 +15,7 @@ municipios = [
     "València", "Xàtiva", "Xirivella"
 ]
 
-def main():
-    # Configuración de la página
-    st.set_page_config(
-        page_title="PlouTerreta",
-        page_icon="🌦️",
-        layout="wide",  # Opciones: "centered" o "wide"
-        initial_sidebar_state="expanded"  # Opciones: "auto", "expanded", "collapsed"
-    )
-
+def mostrar_municipio():
     st.sidebar.title("Municipio")
     
     # Establecer 'Quart de Poblet' como municipio predeterminado
@@ -33,18 +28,47 @@ def main():
     codigo_municipio = get_codigo_municipio(selected_municipio)
 
     if codigo_municipio:
-        # Obtener datos y procesarlos
-        data = get_weather_data3(codigo_municipio)
-        if data:
-            # Procesar los datos del clima
-            weather_df = process_weather_data(data[0]["prediccion"]["dia"])
+        # Predicción procesada compartida por todas las sesiones (publicada por refresher.py o procesada aquí)
+        weather_df, resumen_df, version = cargar_prediccion(codigo_municipio)
 
+        if weather_df is not None:
             # Mostrar los datos procesados en la aplicación
-            show_weather_data(weather_df)
+            show_weather_data(weather_df, resumen_df, version)
         else:
             st.error("No se pudieron cargar los datos")
     else:
         st.error("Código de municipio no encontrado")
 
+
+def mostrar_region():
+    st.header("Comunitat Valenciana")
+    # Malla (municipio × hora) publicada por refresher.py
+    malla = cargar_malla()
+    if malla is not None:
+        show_region(malla)
+    else:
+        st.info("La vista regional se genera al ejecutar refresher.py")
+
+
+def main():
+    # Configuración de la página
+    st.set_page_config(
+        page_title="PlouTerreta",
+        page_icon="🌦️",
+        layout="wide",  # Opciones: "centered" o "wide"
+        initial_sidebar_state="expanded"  # Opciones: "auto", "expanded", "collapsed"
+    )
+
+    vista = st.sidebar.radio("Vista", ["Municipio", "Comunitat Valenciana"], horizontal=True)
+    if vista == "Municipio":
+        mostrar_municipio()
+    else:
+        mostrar_region()
+
+    # Aciertos y fallos de las cachés compartidas del proceso
+    with st.sidebar.expander("Cachés", expanded=False):
+        for nombre, cache in (("Predicciones", forecast_cache), ("DataFrames", frame_cache), ("Gráficos", figure_cache)):
+            st.caption(f"{nombre}: {cache.estadisticas()}")
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,134 @@
+import argparse, sys, time, traceback
+from datetime import datetime
+
+from app.alertas import MotorAlertas, cargar_alertas, guardar_alertas, texto_alerta
+from app.archive import archivar_batch
+from app.bulk_fetch import PETICIONES_POR_SEGUNDO, WORKERS, mostrar_progreso, prefetch_productos
+from app.cache import get_elaborado
+from app.pipeline import DiasProcesados, get_dias, process_weather_week_batch
+from app.region import construir_malla, publicar_malla
+from app.resumen import resumen_diario
+from app.municipios import PROVINCIAS_CV, municipios_provincias
+from app.store import (cargar_frames, cargar_manifest, cargar_prediccion, guardar_manifest, guardar_prediccion,
+                       publicar_frames)
+
+# Minutos entre dos comprobaciones de nuevas predicciones en AEMET
+INTERVALO_MINUTOS = 20
+
+
+def refrescar(codigos, workers=WORKERS, peticiones_por_segundo=PETICIONES_POR_SEGUNDO, progreso=None,
+              dias_procesados=None, alertas=None):
+    """
+    Descarga las predicciones horaria y diaria y publica los DataFrames semanales de los municipios
+    cuya predicción ha cambiado (según el `elaborado` de AEMET) desde la última publicación.
+    Con `dias_procesados` (compartido entre refrescos) solo se extraen los días que han cambiado, y con
+    `alertas` (un MotorAlertas) solo se vuelven a evaluar las alertas de los municipios actualizados.
+    """
+    manifest = cargar_manifest()
+    publicados = manifest.setdefault("semanal", {})
+
+    # Los dos productos se descargan a la vez, con un único límite de peticiones
+    descargas, fallos_productos = prefetch_productos(codigos, ("horaria", "diaria"), workers, peticiones_por_segundo,
+                                                     guardar=None, progreso=progreso)
+    fallos = {}
+    for producto, fallos_producto in fallos_productos.items():
+        for codigo, error in fallos_producto.items():
+            fallos.setdefault(codigo, {})[producto] = error
+
+    payloads, versiones, elaborados, nuevas = {}, {}, {}, {}
+    for codigo in codigos:
+        # Si falla la descarga de un producto se usa la última predicción guardada de ese producto; sin
+        # ella no se vuelve a publicar el municipio, para no sustituir lo publicado por una semana incompleta
+        recuperadas = {producto: cargar_prediccion(codigo, producto)
+                       for producto in ("horaria", "diaria") if codigo in fallos_productos[producto]}
+        if None in recuperadas.values():
+            continue
+        horaria = recuperadas.get("horaria", descargas["horaria"].get(codigo))
+        diaria = recuperadas.get("diaria", descargas["diaria"].get(codigo))
+        if not horaria and not diaria:
+            continue
+        version = {"horaria": get_elaborado(horaria), "diaria": get_elaborado(diaria)}
+        anterior = publicados.get(codigo, {})
+        if all(version.values()) and all(anterior.get(producto) == elaborado for producto, elaborado in version.items()):
+            continue  # AEMET no ha publicado nada nuevo para este municipio
+        elaborados[codigo] = version
+
+        nuevas[codigo] = {producto: data for producto, data in (("horaria", horaria), ("diaria", diaria))
+                          if data and producto not in recuperadas}
+        payloads[codigo] = (get_dias(horaria), get_dias(diaria))
+        # Al archivo solo van las filas de los productos con una emisión nueva
+        versiones[codigo] = {producto: elaborado if anterior.get(producto) != elaborado else None
+                             for producto, elaborado in version.items()}
+
+    actualizados = 0
+    if payloads:
+        # Procesar los datos una sola vez por actualización y publicarlos para todas las sesiones; los
+        # municipios con una predicción que no se puede procesar se quedan como estaban publicados
+        errores = {}
+        batch_df = process_weather_week_batch(payloads, dias_procesados, errores)
+        for codigo, error in errores.items():
+            fallos.setdefault(codigo, {})["proceso"] = error
+        procesados = [codigo for codigo in payloads if codigo not in errores]
+        for codigo in procesados:
+            for producto, data in nuevas[codigo].items():
+                guardar_prediccion(codigo, data, producto)
+            publicados[codigo] = {**elaborados[codigo], "publicado": datetime.now().isoformat(timespec="seconds")}
+        actualizados = len(procesados)
+
+    if actualizados:
+        # Todos los municipios actualizados se publican juntos en un único fichero nuevo
+        publicar_frames(batch_df, "semanal")
+        publicar_frames(resumen_diario(batch_df), "resumen")
+        archivar_batch(batch_df, {codigo: versiones[codigo] for codigo in procesados})
+        # Malla (municipio × hora) de la vista regional con todos los municipios publicados
+        publicar_malla(construir_malla(cargar_frames("semanal")))
+        if alertas is not None:
+            alertas.actualizar(batch_df)
+    guardar_manifest(manifest)
+    return actualizados, fallos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresca en segundo plano las predicciones publicadas para la app.")
+    parser.add_argument("--provincias", nargs="+", default=list(PROVINCIAS_CV),
+                        help="códigos de provincia a refrescar (por defecto 03 12 46)")
+    parser.add_argument("--intervalo", type=float, default=INTERVALO_MINUTOS,
+                        help="minutos entre comprobaciones de nuevas predicciones")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="descargas simultáneas")
+    parser.add_argument("--peticiones-por-segundo", type=float, default=PETICIONES_POR_SEGUNDO,
+                        help="límite global de peticiones a AEMET")
+    parser.add_argument("--una-vez", action="store_true", help="refresca una sola vez y termina")
+    args = parser.parse_args()
+
+    codigos = municipios_provincias(args.provincias)
+    dias_procesados = DiasProcesados()
+    # Las alertas ya publicadas no se vuelven a emitir; los municipios que no cambien conservan las suyas
+    alertas = MotorAlertas(emitidas=[(a["regla"], a["municipio"], a["fecha"]) for a in cargar_alertas()])
+    publicados = cargar_frames("semanal")
+    if publicados is not None:
+        alertas.actualizar(publicados)
+    while True:
+        inicio = time.perf_counter()
+        try:
+            actualizados, fallos = refrescar(codigos, args.workers, args.peticiones_por_segundo, mostrar_progreso,
+                                             dias_procesados, alertas)
+            print(f"\n[{datetime.now():%Y-%m-%d %H:%M:%S}] {actualizados} municipios actualizados, "
+                  f"{len(fallos)} fallos en {time.perf_counter() - inicio:.1f} s", file=sys.stderr)
+            for codigo, errores in sorted(fallos.items()):
+                if "proceso" in errores:
+                    print(f"{codigo}\t{codigos.get(codigo, codigo)}\t{errores['proceso']}", file=sys.stderr)
+            for episodio in alertas.nuevas().to_dict("records"):
+                print(f"⚠️ {codigos.get(episodio['municipio'], episodio['municipio'])}: {texto_alerta(episodio)}", file=sys.stderr)
+            guardar_alertas(alertas.activas())
+        except Exception:
+            # Un refresco fallido (p. ej. sin espacio en disco) no detiene el proceso: se reintenta en el siguiente
+            print(f"\n[{datetime.now():%Y-%m-%d %H:%M:%S}] Error en el refresco:", file=sys.stderr)
+            traceback.print_exc()
+            fallos = {"refresco": "error"}
+        if args.una_vez:
+            return 1 if fallos else 0
+        time.sleep(max(0, args.intervalo * 60 - (time.perf_counter() - inicio)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())